@@ -0,0 +1,47 @@
+# bench_listing.py
+import argparse
+import re
+from bench_memory import make_todos
+import todo_tools
+
+# Rough token count: words and single punctuation marks, close to what BPE
+# tokenizers produce for this kind of text
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def render(todos, hints: bool = True, fields=None) -> str:
+    """Render todos like a list_todos page, in the full or a compact view"""
+    todo_tools.completion_hints = hints
+    parts = [f"Found {len(todos)} todo(s):\n\n"]
+    for i, todo in enumerate(todos, 1):
+        if fields:
+            todo_tools.format_compact(parts, i, todo, fields)
+        else:
+            todo_tools.format_todo(parts, i, todo)
+    return "".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the size of list_todos pages per todo in each view")
+    parser.add_argument("--count", type=int, default=todo_tools.DEFAULT_PAGE_SIZE, help="Todos per page")
+    args = parser.parse_args()
+
+    todos = make_todos(args.count)
+    views = {
+        "full (SSE, with hints)": render(todos),
+        "full (stdio, no hints)": render(todos, hints=False),
+        "compact": render(todos, fields=todo_tools.COMPACT_FIELDS),
+        "compact, id+title": render(todos, fields=("id", "title")),
+        "json": todo_tools.json_response({"todos": todos}),
+        "json, compact": todo_tools.json_response(
+            {"todos": todo_tools.project_todos(todos, todo_tools.COMPACT_FIELDS)}),
+        "json, id+title": todo_tools.json_response({"todos": todo_tools.project_todos(todos, ("id", "title"))}),
+    }
+
+    baseline = len(TOKEN_RE.findall(views["full (SSE, with hints)"]))
+    print(f"{'view':<26}{'bytes/todo':>12}{'tokens/todo':>13}{'vs full':>9}")
+    for name, text in views.items():
+        size = len(text.encode())
+        tokens = len(TOKEN_RE.findall(text))
+        print(f"{name:<26}{size / args.count:>12.0f}{tokens / args.count:>13.1f}{tokens / baseline:>9.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# bench_memory.py
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+from records import TodoRecord
+
+def make_todos(count: int):
+    """Generate todos in the dict shape the tools create"""
+    start = datetime(2025, 1, 1)
+    todos = []
+    for i in range(count):
+        created = (start + timedelta(seconds=i, microseconds=random.randint(0, 999999))).isoformat()
+        todos.append({
+            "id": f"todo_{created[:19].replace('-', '').replace(':', '').replace('T', '_')}_{i}",
+            "title": f"Task number {i}",
+            "description": "Some details about the task" if i % 2 else "",
+            "priority": random.choice(["high", "medium", "low"]),
+            "completed": random.random() < 0.3,
+            "created_at": created,
+            "updated_at": created,
+        })
+    return todos
+
+def measure(build) -> int:
+    """Return the bytes allocated by build() that are still alive afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the in-memory size of todos as dicts and as TodoRecords")
+    parser.add_argument("--count", type=int, default=100_000, help="Number of todos")
+    args = parser.parse_args()
+
+    # Serialize and parse, like loading the store does, so no strings are shared with the generator
+    encoded = json.dumps({todo["id"]: todo for todo in make_todos(args.count)})
+
+    as_dicts = measure(lambda: json.loads(encoded))
+    as_records = measure(lambda: {record.id: record for record in map(TodoRecord.from_dict, json.loads(encoded).values())})
+
+    print(f"Todos:            {args.count}")
+    print(f"dict per todo:    {as_dicts / args.count:.0f} bytes")
+    print(f"record per todo:  {as_records / args.count:.0f} bytes")
+    print(f"Saving:           {100 * (1 - as_records / as_dicts):.0f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# benchmark.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from bench_memory import make_todos
+
+DEFAULT_MIX = "list_todos=4,get_todo_stats=2,create_todo=2,complete_todo_by_number=1,search_todos=1"
+
+# Arguments of each tool the benchmark can call
+TOOL_ARGUMENTS = {
+    "create_todo": lambda rng: {
+        "title": f"Benchmark task {rng.randrange(1_000_000)}",
+        "priority": rng.choice(["high", "medium", "low"]),
+    },
+    "list_todos": lambda rng: {"filter_by": rng.choice(["all", "pending", "completed"])},
+    "search_todos": lambda rng: {"query": rng.choice(["task", "number", "details", "benchmark"])},
+    "get_todo_stats": lambda rng: {},
+    "complete_todo_by_number": lambda rng: {"position": rng.randint(1, 10)},
+}
+
+def parse_mix(text: str) -> Dict[str, int]:
+    """Parse a mix like 'list_todos=4,create_todo=1' into tool weights"""
+    mix = {}
+    for part in text.split(","):
+        tool, _, weight = part.partition("=")
+        tool = tool.strip()
+        if tool not in TOOL_ARGUMENTS:
+            raise SystemExit(f"Unknown tool in mix: {tool} (choose from {', '.join(TOOL_ARGUMENTS)})")
+        mix[tool] = int(weight or 1)
+    return mix
+
+def prepare_store(directory: str, size: int) -> str:
+    """Write a todos.json with size todos and return its path"""
+    path = os.path.join(directory, "todos.json")
+    with open(path, 'w') as f:
+        json.dump({todo["id"]: todo for todo in make_todos(size)}, f)
+    return path
+
+def start_server(todos_file: str, port: int, backend: str, timeout: float) -> subprocess.Popen:
+    """Start server.py on a port and wait until it accepts connections"""
+    env = dict(os.environ, PORT=str(port), TODOS_FILE=todos_file, TODOS_BACKEND=backend)
+    log = open(os.path.join(os.path.dirname(todos_file), "server.log"), 'w')
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    process = subprocess.Popen([sys.executable, server_path], env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}, see {log.name}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"Server did not start within {timeout:.0f}s")
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+async def warm_up(url: str):
+    """Make one call so the server has loaded its store before measuring"""
+    async with sse_client(url, timeout=30) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            await session.call_tool("get_todo_stats", arguments={})
+
+async def run_session(url: str, ops: int, mix: Dict[str, int], seed: int,
+                      ready: asyncio.Queue, start: asyncio.Event,
+                      latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    """Open one SSE session, wait for the start signal and make ops tool calls"""
+    rng = random.Random(seed)
+    tools, weights = list(mix), list(mix.values())
+    async with sse_client(url, timeout=30) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            await ready.put(seed)
+            await start.wait()
+            for tool in rng.choices(tools, weights, k=ops):
+                began = time.perf_counter()
+                try:
+                    result = await session.call_tool(tool, arguments=TOOL_ARGUMENTS[tool](rng))
+                    failed = result.isError
+                except Exception:
+                    failed = True
+                latencies[tool].append(time.perf_counter() - began)
+                if failed:
+                    errors[tool] += 1
+
+async def run_load(url: str, sessions: int, ops: int, mix: Dict[str, int], seed: int):
+    """Run all sessions at once; returns (wall time, latencies and errors per tool)"""
+    latencies: Dict[str, List[float]] = {tool: [] for tool in mix}
+    errors: Dict[str, int] = {tool: 0 for tool in mix}
+    ready: asyncio.Queue = asyncio.Queue()
+    start = asyncio.Event()
+    tasks = [
+        asyncio.create_task(run_session(url, ops, mix, seed + i, ready, start, latencies, errors))
+        for i in range(sessions)
+    ]
+
+    # Start measuring once every session is connected
+    for _ in range(sessions):
+        getter = asyncio.ensure_future(ready.get())
+        done, _ = await asyncio.wait([getter, *tasks], return_when=asyncio.FIRST_COMPLETED)
+        if getter not in done:
+            getter.cancel()
+            for task in done:
+                task.result()
+    began = time.perf_counter()
+    start.set()
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - began, latencies, errors
+
+def report(label: str, wall: float, latencies: Dict[str, List[float]], errors: Dict[str, int]):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{label}: {total} calls in {wall:.2f}s, {total / wall:.0f} ops/s")
+    print(f"{'tool':<26}{'calls':>8}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    for tool, values in latencies.items():
+        values = sorted(values)
+        print(
+            f"{tool:<26}{len(values):>8}{len(values) / wall:>9.0f}"
+            f"{percentile(values, 50) * 1000:>9.1f}{percentile(values, 95) * 1000:>9.1f}"
+            f"{percentile(values, 99) * 1000:>9.1f}{errors[tool]:>8}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the SSE server with many concurrent sessions")
+    parser.add_argument("--sizes", default="100,10000,100000",
+                        help="Comma-separated store sizes to benchmark, each against a fresh server")
+    parser.add_argument("--sessions", type=int, default=100, help="Number of concurrent SSE sessions")
+    parser.add_argument("--ops", type=int, default=20, help="Tool calls per session")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted tool mix, e.g. 'list_todos=4,create_todo=1'")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"], help="Storage backend of the server")
+    parser.add_argument("--port", type=int, default=8765, help="Port to start the server on")
+    parser.add_argument("--url", help="Benchmark an already running server at this SSE URL instead")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the call sequence")
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the server to load")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        report(args.url, *asyncio.run(run_load(args.url, args.sessions, args.ops, mix, args.seed)))
+        return
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        directory = tempfile.mkdtemp(prefix="todo-bench-")
+        process: Optional[subprocess.Popen] = None
+        try:
+            todos_file = prepare_store(directory, size)
+            began = time.perf_counter()
+            process = start_server(todos_file, args.port, args.backend, args.startup_timeout)
+            url = f"http://127.0.0.1:{args.port}/sse"
+            asyncio.run(warm_up(url))
+            print(f"\nServer with {size} todos ({args.backend}) ready in {time.perf_counter() - began:.2f}s")
+            result = asyncio.run(run_load(url, args.sessions, args.ops, mix, args.seed))
+            report(f"{size} todos, {args.sessions} sessions", *result)
+        finally:
+            if process is not None:
+                stop_server(process)
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
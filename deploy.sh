@@ -6,6 +6,14 @@ SERVICE_NAME="todo-mcp-server"
 REGION="us-central1"
 IMAGE_NAME="gcr.io/${PROJECT_ID}/${SERVICE_NAME}"
 
+# Optional persistent store: a Filestore/NFS export holding the SQLite database, so
+# todos survive restarts and redeploys. Cloud Run mounts NFS without file locks,
+# which SQLite needs to coordinate writers, so the service is then limited to one
+# instance. Leave empty to keep a separate store per instance.
+NFS_SERVER=""          # e.g. 10.0.0.2
+NFS_PATH="/todos"
+MAX_INSTANCES=10
+
 echo "🚀 Deploying Todo MCP Server to Google Cloud Run"
 echo "================================================"
 
@@ -43,7 +51,23 @@ docker build -t ${IMAGE_NAME} .
 echo "📤 Pushing image to GCR..."
 docker push ${IMAGE_NAME}
 
+# Shared store settings
+SHARED_STORE_FLAGS=()
+if [ -n "${NFS_SERVER}" ]; then
+    echo "🗄️  Using the store on ${NFS_SERVER}:${NFS_PATH} (one instance)"
+    # Without NFS locks, a second instance writing the database could corrupt it
+    MAX_INSTANCES=1
+    # WAL needs shared memory on one host, so use a rollback journal over NFS
+    SHARED_STORE_FLAGS=(
+        --execution-environment gen2
+        --add-volume name=todos,type=nfs,location=${NFS_SERVER}:${NFS_PATH}
+        --add-volume-mount volume=todos,mount-path=/app/data
+        --set-env-vars TODOS_BACKEND=sqlite,TODOS_SQLITE_JOURNAL_MODE=delete
+    )
+fi
+
 # Deploy to Cloud Run
+# Session affinity keeps each SSE session's messages on the instance holding its stream
 echo "🚀 Deploying to Cloud Run..."
 gcloud run deploy ${SERVICE_NAME} \
     --image ${IMAGE_NAME} \
@@ -54,7 +78,9 @@ gcloud run deploy ${SERVICE_NAME} \
     --memory 512Mi \
     --timeout 3600 \
     --concurrency 1000 \
-    --max-instances 10
+    --max-instances ${MAX_INSTANCES} \
+    --session-affinity \
+    "${SHARED_STORE_FLAGS[@]}"
 
 # Get the service URL
 SERVICE_URL=$(gcloud run services describe ${SERVICE_NAME} --region=${REGION} --format="value(status.url)")
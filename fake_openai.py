@@ -0,0 +1,154 @@
+# fake_openai.py
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List
+import uvicorn
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from benchmark import prepare_store, start_server, stop_server
+from openai_client import TodoMCPClient
+
+MODEL = "gpt-4.1"
+
+# Tool calls the fake model makes for every new user message
+SCRIPTED_CALLS = [
+    ("get_todo_stats", {}),
+    ("list_todos", {"filter_by": "pending", "view": "compact"}),
+]
+
+def plan(messages: List[Dict[str, Any]], answer_words: int) -> Dict[str, Any]:
+    """Decide the fake model's turn: the scripted tool calls, or an answer once their results are in"""
+    if messages and messages[-1].get("role") == "user":
+        return {"tool_calls": [
+            {"id": f"call_{i}", "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+            for i, (name, arguments) in enumerate(SCRIPTED_CALLS)
+        ]}
+    words = [f"word{i}" for i in range(answer_words)]
+    return {"content": "Here is what I found: " + " ".join(words) + "."}
+
+def tokens(turn: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Split a turn into the deltas a streaming model would send, about one token each"""
+    if "content" in turn:
+        words = turn["content"].split(" ")
+        return [{"content": word if i == 0 else " " + word} for i, word in enumerate(words)]
+    deltas = []
+    for index, call in enumerate(turn["tool_calls"]):
+        deltas.append({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                       "function": {"name": call["function"]["name"], "arguments": ""}}]})
+        arguments = call["function"]["arguments"]
+        for start in range(0, len(arguments), 4):
+            deltas.append({"tool_calls": [{"index": index, "function": {"arguments": arguments[start:start + 4]}}]})
+    return deltas
+
+def create_app(token_delay: float = 0.02, answer_words: int = 50) -> Starlette:
+    """OpenAI-compatible chat completions endpoint generating one token every token_delay seconds"""
+    async def chat_completions(request: Request):
+        body = await request.json()
+        turn = plan(body["messages"], answer_words)
+        deltas = tokens(turn)
+        finish_reason = "tool_calls" if "tool_calls" in turn else "stop"
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": body.get("model", MODEL)}
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * len(deltas))
+            message = {"role": "assistant", "content": turn.get("content")}
+            if "tool_calls" in turn:
+                message["tool_calls"] = turn["tool_calls"]
+            return JSONResponse({**base, "object": "chat.completion",
+                                 "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}]})
+
+        async def events():
+            for delta in [{"role": "assistant"}, *deltas]:
+                await asyncio.sleep(token_delay)
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+def serve_in_thread(app: Starlette, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def measure(mcp_url: str, base_url: str, stream: bool) -> Dict[str, float]:
+    """Time one query: first answer text, first tool call started and the complete answer"""
+    times: Dict[str, float] = {}
+    began = time.perf_counter()
+
+    def on_text(text: str):
+        times.setdefault("first text", time.perf_counter() - began)
+
+    client = TodoMCPClient(mcp_url, stream=stream, on_text=on_text, base_url=base_url)
+    execute_tool = client.execute_tool
+
+    async def timed_execute_tool(session, tool_name, arguments):
+        times.setdefault("first tool call", time.perf_counter() - began)
+        return await execute_tool(session, tool_name, arguments)
+
+    client.execute_tool = timed_execute_tool
+    async with sse_client(mcp_url) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream, message_handler=client.handle_message) as session:
+            await session.initialize()
+            await client.get_available_tools(session)
+            began = time.perf_counter()
+            await client.process_user_query(session, "What is on my plate?")
+    times["answer"] = time.perf_counter() - began
+    # Without streaming, the first text arrives with the whole answer
+    times.setdefault("first text", times["answer"])
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server streaming scripted answers")
+    parser.add_argument("--port", type=int, default=8060, help="Port of the fake OpenAI server")
+    parser.add_argument("--token-delay-ms", type=float, default=20, help="Time the fake model takes per token")
+    parser.add_argument("--answer-words", type=int, default=50, help="Length of the fake model's answers")
+    parser.add_argument("--measure", action="store_true",
+                        help="Start server.py and measure openai_client.py's time to first token with and without streaming")
+    parser.add_argument("--mcp-port", type=int, default=8766, help="Port to start server.py on with --measure")
+    args = parser.parse_args()
+    app = create_app(args.token_delay_ms / 1000, args.answer_words)
+
+    if not args.measure:
+        uvicorn.run(app, host="127.0.0.1", port=args.port)
+        return
+
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    directory = tempfile.mkdtemp(prefix="todo-ttft-")
+    fake = serve_in_thread(app, args.port)
+    process = None
+    try:
+        process = start_server(prepare_store(directory, 100), args.mcp_port, "json", 60)
+        mcp_url = f"http://127.0.0.1:{args.mcp_port}/sse"
+        base_url = f"http://127.0.0.1:{args.port}/v1"
+        print(f"{'mode':<12}{'first tool ms':>15}{'first text ms':>15}{'answer ms':>12}")
+        for stream in (False, True):
+            times = asyncio.run(measure(mcp_url, base_url, stream))
+            print(f"{'stream' if stream else 'blocking':<12}{times['first tool call'] * 1000:>15.0f}"
+                  f"{times['first text'] * 1000:>15.0f}{times['answer'] * 1000:>12.0f}")
+    finally:
+        if process is not None:
+            stop_server(process)
+        fake.should_exit = True
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
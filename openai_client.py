@@ -2,22 +2,58 @@
 import asyncio
 import json
 import os
-from typing import Dict, List, Any
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from openai import AsyncOpenAI
-from mcp import ClientSession
-from mcp.client.sse import sse_client
+from openai.types.chat import ChatCompletionMessageToolCall
+from mcp import ClientSession, types
+from session_pool import MCPSessionPool
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Kept identical across queries (the tools are passed separately with tools=),
+# so the prompt prefix can be served from OpenAI's prompt cache
+SYSTEM_PROMPT = """You are a helpful assistant that manages a todo list. Use the available tools to help users manage their tasks. 
+
+Important guidelines:
+1. When creating todos, ALWAYS mention the ID that was returned
+2. When users want to complete/update/delete a task by number (like "2nd task"), first list the todos to see the IDs, then use the specific ID
+3. To complete a todo, you need the exact todo_id (like 'todo_06A689HJG5D3S4F2E000')
+4. Be helpful and suggest using the list_todos tool if users reference tasks by position
+
+Always be specific about what actions you're taking and include relevant IDs in your responses."""
+
 class TodoMCPClient:
-    def __init__(self, mcp_url: str = "http://localhost:8050/sse"):
+    def __init__(self, mcp_url: str = "http://localhost:8050/sse", max_rounds: int = 8, max_parallel_tools: int = 4,
+                 stream: bool = False, on_text: Optional[Callable[[str], None]] = None,
+                 base_url: Optional[str] = None):
         self.mcp_url = mcp_url
-        self.openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
+        self.openai = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=base_url)
+        # With stream, assistant text is passed to on_text (printed by default) as it arrives
+        self.stream = stream
+        self.on_text = on_text or (lambda text: print(text, end="", flush=True))
+        # Model turns that may request tools before it has to answer, and tool calls run at once
+        self.max_rounds = max(1, max_rounds)
+        self.max_parallel_tools = max(1, max_parallel_tools)
+        # Converted tool schemas per session, until the server's tool list changes
+        self._tools: "weakref.WeakKeyDictionary[ClientSession, List[Dict[str, Any]]]" = weakref.WeakKeyDictionary()
+
+    async def handle_message(self, message) -> None:
+        """Message handler for ClientSession; forgets cached tools when the server's tool list changes"""
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ToolListChangedNotification):
+            self._tools.clear()
+
     async def get_available_tools(self, session) -> List[Dict[str, Any]]:
-        """Get all available MCP tools"""
+        """Get all available MCP tools, listing them only once per session"""
+        tools = self._tools.get(session)
+        if tools is None:
+            tools = self._tools[session] = await self.list_tools(session)
+        return tools
+
+    async def list_tools(self, session) -> List[Dict[str, Any]]:
+        """List the MCP tools of a session in OpenAI function format"""
         tools_result = await session.list_tools()
         
         # Convert MCP tools to OpenAI function format
@@ -46,26 +82,102 @@ class TodoMCPClient:
         result = await session.call_tool(tool_name, arguments=arguments)
         return result.content[0].text
     
+    async def run_tool_call(self, session, tool_call, limit: asyncio.Semaphore) -> Dict[str, Any]:
+        """Execute one tool call of the model, returning its tool message
+
+        Failures are reported to the model as the tool's output, so it can
+        correct itself in the next round.
+        """
+        function_name = tool_call.function.name
+        async with limit:
+            try:
+                function_args = json.loads(tool_call.function.arguments or "{}")
+                print(f"Executing tool: {function_name} with args: {function_args}")
+                output = await self.execute_tool(session, function_name, function_args)
+            except Exception as e:
+                output = f"Error: {function_name} failed: {e}"
+        return {
+            "role": "tool",
+            "content": output,
+            "tool_call_id": tool_call.id
+        }
+
+    async def stream_turn(self, session, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]],
+                          tool_choice: str, limit: asyncio.Semaphore) -> Tuple[Dict[str, Any], List[asyncio.Task]]:
+        """Stream one model turn, passing its text to on_text as it arrives
+
+        Tool calls are assembled from their deltas and each one starts running
+        as soon as its arguments are complete, i.e. when the next tool call
+        begins or the stream ends. Returns the assistant message and the tasks
+        running its tool calls, in the order the model requested them.
+        """
+        stream = await self.openai.chat.completions.create(
+            model="gpt-4.1",
+            messages=messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            stream=True
+        )
+        text: List[str] = []
+        calls: List[Dict[str, Any]] = []
+        tasks: List[asyncio.Task] = []
+
+        def dispatch(count: int):
+            while len(tasks) < count:
+                tool_call = ChatCompletionMessageToolCall.model_validate(calls[len(tasks)])
+                tasks.append(asyncio.create_task(self.run_tool_call(session, tool_call, limit)))
+
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    text.append(delta.content)
+                    self.on_text(delta.content)
+                for part in delta.tool_calls or ():
+                    # Deltas of a tool call start with its id and name, then carry argument fragments
+                    dispatch(part.index)
+                    while len(calls) <= part.index:
+                        calls.append({"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                    call = calls[part.index]
+                    if part.id:
+                        call["id"] = part.id
+                    if part.function and part.function.name:
+                        call["function"]["name"] += part.function.name
+                    if part.function and part.function.arguments:
+                        call["function"]["arguments"] += part.function.arguments
+            dispatch(len(calls))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+        message: Dict[str, Any] = {"role": "assistant", "content": "".join(text) or None}
+        if calls:
+            message["tool_calls"] = calls
+        return message, tasks
+
     async def process_user_query(self, session, user_query: str) -> str:
-        """Process a user query using OpenAI and MCP tools"""
+        """Process a user query using OpenAI and MCP tools
+
+        session can be a ClientSession or an MCPSessionPool, which spreads
+        the tool calls over its sessions.
+        The model may request tools for up to max_rounds turns; the tool calls
+        of a turn run concurrently (at most max_parallel_tools at once) and
+        their results are added in the order the model requested them. With
+        stream, tool calls start while the model is still generating the rest
+        of its turn.
+        """
         # Get available tools
         tools = await self.get_available_tools(session)
+        limit = asyncio.Semaphore(self.max_parallel_tools)
         
         # Create the conversation
         messages = [
             {
                 "role": "system",
-                "content": f"""You are a helpful assistant that manages a todo list. Use the available tools to help users manage their tasks. 
-
-Important guidelines:
-1. When creating todos, ALWAYS mention the ID that was returned
-2. When users want to complete/update/delete a task by number (like "2nd task"), first list the todos to see the IDs, then use the specific ID
-3. To complete a todo, you need the exact todo_id (like 'todo_20250526_171415_0')
-4. Be helpful and suggest using the list_todos tool if users reference tasks by position
-
-Always be specific about what actions you're taking and include relevant IDs in your responses.
-
-Here are the tools you could use (if necessary): {tools}"""
+                "content": SYSTEM_PROMPT
             },
             {
                 "role": "user",
@@ -73,99 +185,76 @@ Here are the tools you could use (if necessary): {tools}"""
             }
         ]
         
-        # Get OpenAI's response with function calling
-        response = await self.openai.chat.completions.create(
-            model="gpt-4.1",
-            messages=messages,
-            tools=tools,
-            tool_choice="auto"
-        )
-        
-        # Check if OpenAI wants to use a tool
-        response_message = response.choices[0].message
-        
-        if response_message.tool_calls:
-            # Execute the tool calls
-            tool_results = []
-            
-            for tool_call in response_message.tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-                
-                print(f"Executing tool: {function_name} with args: {function_args}")
-                
-                # Execute the MCP tool
-                result = await self.execute_tool(session, function_name, function_args)
-                tool_results.append({
-                    "tool_call_id": tool_call.id,
-                    "output": result
-                })
+        for round_number in range(self.max_rounds + 1):
+            # After max_rounds of tool use the model has to answer with what it has;
+            # the tools are still passed so the prompt prefix stays cacheable
+            tool_choice = "auto" if round_number < self.max_rounds else "none"
+            if self.stream:
+                message, tasks = await self.stream_turn(session, messages, tools, tool_choice, limit)
+                content = message["content"]
+            else:
+                response = await self.openai.chat.completions.create(
+                    model="gpt-4.1",
+                    messages=messages,
+                    tools=tools,
+                    tool_choice=tool_choice
+                )
+                message = response.choices[0].message
+                content = message.content
+                tasks = [self.run_tool_call(session, tool_call, limit) for tool_call in message.tool_calls or ()]
             
-            # Add the assistant's message with tool calls
-            messages.append(response_message)
+            if not tasks:
+                return content
             
-            # Add tool results to messages
-            for tool_result in tool_results:
-                messages.append({
-                    "role": "tool",
-                    "content": tool_result["output"],
-                    "tool_call_id": tool_result["tool_call_id"]
-                })
-            
-            # Get final response from OpenAI
-            final_response = await self.openai.chat.completions.create(
-                model="gpt-4.1",
-                messages=messages
-            )
-            
-            return final_response.choices[0].message.content
-        else:
-            # No tool calls needed
-            return response_message.content
+            # Add the assistant's message with tool calls, then their results
+            messages.append(message)
+            messages.extend(await asyncio.gather(*tasks))
+        
+        return content
 
 async def main():
     print("Connecting to Todo MCP Server...")
     
-    # Create client
-    client = TodoMCPClient()
+    # Create client, printing answers as they are generated
+    client = TodoMCPClient(stream=True)
     
-    # Use proper async context managers
-    async with sse_client("http://localhost:8050/sse") as (read_stream, write_stream):
-        async with ClientSession(read_stream, write_stream) as session:
-            await session.initialize()
-            print("Connected!\n")
-            
-            # Example queries
-            queries = [
-                # "Create a high priority task to prepare for the team meeting tomorrow",
-                # "What tasks do I have pending?",
-                # "Show me my todo statistics",
-                "Create a low priority reminder to water the plants"
-            ]
+    # A pool of warm sessions, so the tool calls of a round run on several connections
+    async with MCPSessionPool(client.mcp_url, size=2, message_handler=client.handle_message) as pool:
+        print("Connected!\n")
+        
+        # Example queries
+        queries = [
+            # "Create a high priority task to prepare for the team meeting tomorrow",
+            # "What tasks do I have pending?",
+            # "Show me my todo statistics",
+            "Create a low priority reminder to water the plants"
+        ]
+        
+        for query in queries:
+            print(f"User: {query}")
+            print("Assistant: ", end="", flush=True)
+            await client.process_user_query(pool, query)
+            print("\n")
+            print("-" * 50 + "\n")
             
-            for query in queries:
-                print(f"User: {query}")
-                response = await client.process_user_query(session, query)
-                print(f"Assistant: {response}\n")
-                print("-" * 50 + "\n")
-                
-                # Small delay between queries
-                await asyncio.sleep(1)
+            # Small delay between queries
+            await asyncio.sleep(1)
+        
+        # Interactive mode
+        print("\nEntering interactive mode. Type 'quit' to exit.\n")
+        
+        while True:
+            user_input = (await asyncio.to_thread(input, "You: ")).strip()
             
-            # Interactive mode
-            print("\nEntering interactive mode. Type 'quit' to exit.\n")
+            if user_input.lower() == 'quit':
+                break
             
-            while True:
-                user_input = input("You: ").strip()
-                
-                if user_input.lower() == 'quit':
-                    break
-                
-                try:
-                    response = await client.process_user_query(session, user_input)
-                    print(f"Assistant: {response}\n")
-                except Exception as e:
-                    print(f"Error: {e}\n")
+            try:
+                print("Assistant: ", end="", flush=True)
+                await client.process_user_query(pool, user_input)
+                print("\n")
+            except Exception as e:
+                print(f"\nError: {e}\n")
 
 if __name__ == "__main__":
     # Check for OpenAI API key
@@ -0,0 +1,188 @@
+# profiling.py
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+MODES = ("phases", "cprofile")
+
+# Tool whose call is being profiled; phases outside a tool call (the log
+# writer thread) are reported under BACKGROUND
+current_tool: ContextVar[Optional[str]] = ContextVar("current_tool", default=None)
+BACKGROUND = "(background)"
+
+_NOT_PROFILING = nullcontext()
+
+
+class Profiler:
+    """Opt-in profiling of tool calls for a time window.
+
+    In "phases" mode each tool call is timed as a whole and by phase (store
+    lookups, formatting, persisting), as marked with phase() in the tools.
+    "cprofile" mode additionally runs each call under cProfile and merges the
+    statistics; as only one cProfile can be active at a time, it serializes
+    tool calls for the duration of the window. Outside a window, call() and
+    phase() only check the clock.
+    """
+
+    def __init__(self):
+        self.mode = "phases"
+        self.started = 0.0
+        self.until = 0.0
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        # (tool, phase or None for the whole call) -> [count, total seconds, max seconds]
+        self._timings: Dict[Tuple[str, Optional[str]], List[float]] = {}
+        self._stats: Optional[pstats.Stats] = None
+
+    @property
+    def active(self) -> bool:
+        return time.monotonic() < self.until
+
+    def start(self, seconds: float, mode: str = "phases"):
+        """Discard previous results and profile for the next seconds"""
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode} (choose from {', '.join(MODES)})")
+        with self._lock:
+            self._timings.clear()
+            self._stats = None
+            self.mode = mode
+            self.started = time.monotonic()
+            self.until = self.started + seconds
+
+    def stop(self):
+        self.until = min(self.until, time.monotonic())
+
+    def call(self, tool: str, function: Callable[[], object]):
+        """Run a tool call, profiling it if a window is active"""
+        if not self.active:
+            return function()
+        token = current_tool.set(tool)
+        began = time.perf_counter()
+        try:
+            if self.mode != "cprofile":
+                return function()
+            with self._cprofile_lock:
+                profile = cProfile.Profile()
+                try:
+                    return profile.runcall(function)
+                finally:
+                    self._merge(profile)
+        finally:
+            self._record(tool, None, time.perf_counter() - began)
+            current_tool.reset(token)
+
+    def phase(self, name: str):
+        """Context manager timing a phase of the current tool call"""
+        if not self.active:
+            return _NOT_PROFILING
+        return self._timed_phase(name)
+
+    def summary(self) -> Optional[Dict]:
+        """Return the timings of the current or last window by tool and phase, or None if never started
+
+        Tools are sorted by total time. Phases outside a tool call are under
+        BACKGROUND, which has no timing of its own (0 calls).
+        """
+        if not self.started:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            timings = {key: list(value) for key, value in self._timings.items()}
+
+        def entry(value: Optional[List[float]]) -> Dict:
+            if value is None:
+                return {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            count, total, longest = value
+            return {"calls": count, "total_ms": round(total * 1000, 3), "max_ms": round(longest * 1000, 3)}
+
+        tools = []
+        for tool in sorted({tool for tool, _ in timings}, key=lambda tool: -timings.get((tool, None), [0, 0.0])[1]):
+            phases = sorted(((phase, value) for (t, phase), value in timings.items() if t == tool and phase is not None),
+                            key=lambda item: -item[1][1])
+            tools.append({"tool": tool, **entry(timings.get((tool, None))),
+                          "phases": [{"phase": phase, **entry(value)} for phase, value in phases]})
+        return {
+            "mode": self.mode,
+            "state": "running" if now < self.until else "finished",
+            "seconds": round(min(now, self.until) - self.started, 3),
+            "calls": sum(count for (tool, phase), (count, _, _) in timings.items() if phase is None),
+            "tools": tools,
+        }
+
+    def report(self, top: int = 25) -> str:
+        """Summarize the timings (and cProfile statistics) of the current or last window"""
+        summary = self.summary()
+        if summary is None:
+            return "Profiling has not been started"
+        with self._lock:
+            profile_text = None
+            if self._stats is not None:
+                stream = io.StringIO()
+                self._stats.stream = stream
+                self._stats.sort_stats("cumulative").print_stats(top)
+                profile_text = stream.getvalue().strip()
+
+        lines = [f"Profile ({summary['mode']}, {summary['state']}): {summary['calls']} tool call(s) "
+                 f"in {summary['seconds']:.1f}s", ""]
+        lines.append(f"{'tool / phase':<32}{'calls':>8}{'total ms':>12}{'mean ms':>10}{'max ms':>10}")
+        for tool in summary["tools"]:
+            rows = [(tool["tool"], tool)] if tool["calls"] else [(tool["tool"], None)]
+            rows += [(f"  {phase['phase']}", phase) for phase in tool["phases"]]
+            for label, value in rows:
+                if value is None:
+                    lines.append(label)
+                    continue
+                count, total = value["calls"], value["total_ms"]
+                lines.append(f"{label:<32}{count:>8}{total:>12.1f}{total / count:>10.2f}{value['max_ms']:>10.2f}")
+
+        if profile_text is not None:
+            lines += ["", f"cProfile, top {top} by cumulative time:", profile_text]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory: str) -> str:
+        """Write the report (and cProfile statistics, for pstats or snakeviz) to a directory"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        with open(path + ".txt", 'w') as f:
+            f.write(self.report())
+        with self._lock:
+            if self._stats is not None:
+                self._stats.dump_stats(path + ".pstats")
+        return path + ".txt"
+
+    @contextmanager
+    def _timed_phase(self, name: str) -> Iterator[None]:
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(current_tool.get() or BACKGROUND, name, time.perf_counter() - began)
+
+    def _record(self, tool: str, phase: Optional[str], seconds: float):
+        with self._lock:
+            timing = self._timings.get((tool, phase))
+            if timing is None:
+                self._timings[(tool, phase)] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+
+    def _merge(self, profile: cProfile.Profile):
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+
+# Shared by the tools and the store
+profiler = Profiler()
+phase = profiler.phase
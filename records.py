@@ -0,0 +1,131 @@
+# records.py
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Union
+
+# Priorities are stored as small integers; the value is also the listing rank
+PRIORITIES = ("high", "medium", "low")
+PRIORITY_CODES = {name: code for code, name in enumerate(PRIORITIES)}
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_DAY = EPOCH.toordinal()
+
+
+def timestamp_to_micros(value: str) -> int:
+    """Convert an ISO timestamp as written by the tools to microseconds since the epoch
+
+    Timestamps are naive local times, so they are counted from a naive epoch
+    and convert back to exactly the same string. Raises ValueError for
+    anything else, rather than storing a made-up time.
+    """
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {value!r}") from None
+    # Plain arithmetic on the fields: stores convert every timestamp when they
+    # load, and this is several times faster than subtracting datetimes
+    return (((moment.toordinal() - EPOCH_DAY) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second)
+            * 1_000_000 + moment.microsecond)
+
+
+def micros_to_timestamp(micros: int) -> str:
+    """Convert microseconds since the epoch back to an ISO timestamp"""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def optional_micros(value: Optional[str]) -> Optional[int]:
+    """Convert an optional timestamp (due and reminder times; None or "" when unset)"""
+    return timestamp_to_micros(value) if value else None
+
+
+class TodoRecord:
+    """Compact in-memory form of a todo.
+
+    Uses __slots__, an integer priority code and integer timestamps instead of
+    a dict with string values. Priorities outside high/medium/low are kept as
+    their original string. The optional due and reminder times are None when
+    unset and left out of the dict shape. Convert with from_dict()/to_dict()
+    at the persistence and response boundaries.
+    """
+
+    __slots__ = ("id", "title", "description", "priority", "completed", "created_at", "updated_at",
+                 "due_at", "remind_at")
+
+    def __init__(self, id: str, title: str, description: str, priority: Union[int, str],
+                 completed: bool, created_at: int, updated_at: int,
+                 due_at: Optional[int] = None, remind_at: Optional[int] = None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.completed = completed
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.due_at = due_at
+        self.remind_at = remind_at
+
+    @classmethod
+    def from_dict(cls, todo: Dict) -> "TodoRecord":
+        """Convert a todo dict, raising ValueError if one of its timestamps is invalid"""
+        priority = todo["priority"]
+        created_at = todo["created_at"]
+        updated_at = todo["updated_at"]
+        due_at = todo.get("due_at")
+        remind_at = todo.get("remind_at")
+        try:
+            created_micros = timestamp_to_micros(created_at)
+            return cls(
+                todo["id"],
+                todo["title"],
+                todo.get("description", ""),
+                PRIORITY_CODES.get(priority, priority),
+                bool(todo["completed"]),
+                created_micros,
+                # Todos never updated have the same times, parsed once
+                created_micros if updated_at == created_at else timestamp_to_micros(updated_at),
+                timestamp_to_micros(due_at) if due_at else None,
+                timestamp_to_micros(remind_at) if remind_at else None,
+            )
+        except ValueError as e:
+            raise ValueError(f"Todo {todo['id']}: {e}") from None
+
+    def to_dict(self) -> Dict:
+        todo = {
+            "id": self.id,
+            "title": self.title,
+            "description": self.description,
+            "priority": self.priority_name,
+            "completed": self.completed,
+            "created_at": micros_to_timestamp(self.created_at),
+            "updated_at": micros_to_timestamp(self.updated_at),
+        }
+        if self.due_at is not None:
+            todo["due_at"] = micros_to_timestamp(self.due_at)
+        if self.remind_at is not None:
+            todo["remind_at"] = micros_to_timestamp(self.remind_at)
+        return todo
+
+    def copy(self) -> "TodoRecord":
+        return TodoRecord(self.id, self.title, self.description, self.priority,
+                          self.completed, self.created_at, self.updated_at, self.due_at, self.remind_at)
+
+    def apply(self, changes: Dict):
+        """Apply field changes given in the dict shape"""
+        for field, value in changes.items():
+            if field == "priority":
+                value = PRIORITY_CODES.get(value, value)
+            elif field in ("created_at", "updated_at"):
+                value = timestamp_to_micros(value)
+            elif field in ("due_at", "remind_at"):
+                value = optional_micros(value)
+            elif field == "completed":
+                value = bool(value)
+            setattr(self, field, value)
+
+    @property
+    def priority_name(self) -> str:
+        return PRIORITIES[self.priority] if isinstance(self.priority, int) else self.priority
+
+    @property
+    def rank(self) -> int:
+        """Listing rank of the priority; unknown priorities sort as medium"""
+        return self.priority if isinstance(self.priority, int) else PRIORITY_CODES["medium"]
@@ -0,0 +1,96 @@
+# search.py
+import bisect
+import heapq
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Matches in the title count more than matches in the description
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# A query term that is only a prefix of a token scores less than an exact match
+PREFIX_WEIGHT = 0.5
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+class InvertedIndex:
+    """In-memory full-text index over todo titles and descriptions.
+
+    Maps every token to the todos containing it (with a field-weighted term
+    count), and keeps the vocabulary sorted so query terms also match as
+    prefixes. Documents are added and removed incrementally as todos change.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.vocabulary: List[str] = []
+        # Tokens of each indexed todo, so it can be removed again
+        self.doc_tokens: Dict[str, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_tokens)
+
+    def add(self, todo_id: str, title: str, description: str):
+        """Index a todo, replacing any previous version of it"""
+        if todo_id in self.doc_tokens:
+            self.remove(todo_id)
+
+        weights: Dict[str, float] = {}
+        for token in tokenize(title):
+            weights[token] = weights.get(token, 0.0) + TITLE_WEIGHT
+        for token in tokenize(description):
+            weights[token] = weights.get(token, 0.0) + DESCRIPTION_WEIGHT
+
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                bisect.insort(self.vocabulary, token)
+            posting[todo_id] = weight
+        self.doc_tokens[todo_id] = tuple(weights)
+
+    def remove(self, todo_id: str):
+        """Remove a todo from the index"""
+        for token in self.doc_tokens.pop(todo_id, ()):
+            posting = self.postings[token]
+            del posting[todo_id]
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def search(self, query: str, limit: int = 10,
+               accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """Return the best matching (todo_id, score) pairs, best first
+
+        Every query term matches tokens it equals or is a prefix of. Scores add
+        up the idf-weighted field counts of all matched terms.
+
+        Args:
+            query: Free text query
+            limit: Maximum number of results
+            accept: Optional predicate on todo IDs to restrict the results
+        """
+        scores: Dict[str, float] = {}
+        total = len(self.doc_tokens)
+        for term in set(tokenize(query)):
+            i = bisect.bisect_left(self.vocabulary, term)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+                token = self.vocabulary[i]
+                posting = self.postings[token]
+                idf = math.log(1 + total / len(posting))
+                if token != term:
+                    idf *= PREFIX_WEIGHT
+                for todo_id, weight in posting.items():
+                    scores[todo_id] = scores.get(todo_id, 0.0) + weight * idf
+                i += 1
+
+        if accept is not None:
+            scores = {todo_id: score for todo_id, score in scores.items() if accept(todo_id)}
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
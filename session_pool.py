@@ -0,0 +1,206 @@
+# session_pool.py
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+import anyio
+import httpx
+from mcp import ClientSession, types
+from mcp.client.session import MessageHandlerFnT
+from mcp.client.sse import sse_client
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean a session's connection is gone, rather than a failed call
+CONNECTION_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream, httpx.HTTPError, OSError)
+# Errors raised before a request was sent, so it can be retried on another session
+UNSENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+class MCPSessionPool:
+    """Pool of initialized MCP sessions to an SSE server, shared by concurrent callers.
+
+    Each session is kept open by its own task, which pings it every
+    health_interval seconds and reconnects with exponential backoff when the
+    ping does not answer within health_timeout or a call fails with a
+    connection error. Callers borrow the ready session with the fewest calls
+    in flight, and wait when every session already runs max_concurrent calls.
+
+    The pool can stand in for a ClientSession where only list_tools() and
+    call_tool() are used (as by TodoMCPClient); each call borrows a session
+    just for itself, and is retried on another session if its own turns out
+    to be closed before the request was sent:
+
+        async with MCPSessionPool("http://localhost:8050/sse", size=4) as pool:
+            result = await pool.call_tool("get_todo_stats", {})
+            async with pool.session() as session:
+                ...
+    """
+
+    def __init__(self, url: str, size: int = 4, max_concurrent: int = 8,
+                 headers: Optional[Dict[str, Any]] = None,
+                 message_handler: Optional[MessageHandlerFnT] = None,
+                 connect_timeout: float = 30, call_timeout: float = 60,
+                 health_interval: float = 15, health_timeout: float = 5, max_backoff: float = 30):
+        self.url = url
+        self.size = max(1, size)
+        self.max_concurrent = max(1, max_concurrent)
+        self.headers = headers
+        self.message_handler = message_handler
+        self.connect_timeout = connect_timeout
+        self.call_timeout = call_timeout
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_backoff = max_backoff
+        self.connects = 0
+        self._slots = [_Slot() for _ in range(self.size)]
+        self._runners: List[asyncio.Task] = []
+        self._changed: Optional[asyncio.Condition] = None
+        self._closing = False
+
+    @property
+    def ready(self) -> int:
+        """Number of sessions currently connected"""
+        return sum(slot.session is not None for slot in self._slots)
+
+    async def __aenter__(self) -> "MCPSessionPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """Connect all sessions, waiting up to connect_timeout for them to be ready
+
+        Raises ConnectionError if none of them could connect; the others keep
+        retrying in the background.
+        """
+        self._changed = asyncio.Condition()
+        self._closing = False
+        self._runners = [asyncio.create_task(self._run(slot)) for slot in self._slots]
+        try:
+            async with self._changed:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.ready == self.size), self.connect_timeout)
+        except asyncio.TimeoutError:
+            if not self.ready:
+                await self.close()
+                raise ConnectionError(f"Could not connect to the MCP server at {self.url}")
+            logger.warning(f"Only {self.ready} of {self.size} MCP sessions connected, retrying the others")
+
+    async def close(self):
+        """Close all sessions"""
+        self._closing = True
+        for slot in self._slots:
+            slot.wake.set()
+        runners, self._runners = self._runners, []
+        if runners:
+            done, pending = await asyncio.wait(runners, timeout=self.connect_timeout)
+            for runner in pending:
+                runner.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @asynccontextmanager
+    async def session(self, timeout: Optional[float] = None) -> AsyncIterator[ClientSession]:
+        """Borrow the least busy ready session, waiting up to timeout (call_timeout by default) for one"""
+        if self._changed is None or self._closing:
+            raise RuntimeError("The session pool is not started")
+
+        def available():
+            return [slot for slot in self._slots if slot.session is not None and slot.in_flight < self.max_concurrent]
+
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(available), timeout or self.call_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No MCP session available within {timeout or self.call_timeout:.0f}s") from None
+            slot = min(available(), key=lambda slot: slot.in_flight)
+            slot.in_flight += 1
+            session = slot.session
+        try:
+            yield session
+        except CONNECTION_ERRORS:
+            # Reconnect, unless the session was already replaced
+            if slot.session is session:
+                slot.wake.set()
+            raise
+        finally:
+            slot.in_flight -= 1
+            await self._notify()
+
+    async def list_tools(self) -> types.ListToolsResult:
+        return await self._retried(lambda session: session.list_tools())
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> types.CallToolResult:
+        return await self._retried(lambda session: session.call_tool(name, arguments=arguments))
+
+    async def _retried(self, request):
+        for attempt in range(self.size + 1):
+            try:
+                async with self.session() as session:
+                    return await request(session)
+            except UNSENT_ERRORS:
+                if attempt == self.size:
+                    raise
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _run(self, slot: "_Slot"):
+        """Keep a session connected until the pool closes"""
+        delay = 0.5
+        while not self._closing:
+            try:
+                async with sse_client(self.url, headers=self.headers, timeout=self.connect_timeout) as (read_stream, write_stream):
+                    async with ClientSession(read_stream, write_stream,
+                                             read_timeout_seconds=timedelta(seconds=self.call_timeout),
+                                             message_handler=self.message_handler) as session:
+                        await asyncio.wait_for(session.initialize(), self.connect_timeout)
+                        slot.wake.clear()
+                        slot.session = session
+                        self.connects += 1
+                        delay = 0.5
+                        await self._notify()
+                        await self._watch(slot, session)
+            except Exception as e:
+                if not self._closing:
+                    logger.warning(f"MCP session to {self.url} failed: {e!r}")
+            finally:
+                slot.session = None
+            if self._closing:
+                break
+
+            # Back off with jitter, so sessions do not reconnect in lockstep
+            try:
+                await asyncio.wait_for(slot.wake.wait(), delay * random.uniform(0.5, 1.0))
+            except asyncio.TimeoutError:
+                pass
+            slot.wake.clear()
+            delay = min(self.max_backoff, delay * 2)
+
+    async def _watch(self, slot: "_Slot", session: ClientSession):
+        """Ping a session every health_interval until it fails or the slot is woken to reconnect or close"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(slot.wake.wait(), self.health_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(session.send_ping(), self.health_timeout)
+            except Exception as e:
+                logger.warning(f"MCP session to {self.url} failed its health check: {e!r}")
+                return
+
+
+class _Slot:
+    __slots__ = ("session", "in_flight", "wake")
+
+    def __init__(self):
+        self.session: Optional[ClientSession] = None
+        self.in_flight = 0
+        # Set to make the slot's runner reconnect (or stop, when the pool closes)
+        self.wake = asyncio.Event()
@@ -0,0 +1,187 @@
+# snapshot.py
+import argparse
+import mmap
+import os
+import struct
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from records import TodoRecord
+
+# Binary snapshot layout (all integers little-endian):
+#
+#   header   magic "TODOSNAP", format version (u16), reserved (u16), todo count (u32)
+#   index    one fixed-size entry per todo: record offset (u64), completed (u8),
+#            priority code (u8, CUSTOM_PRIORITY if the name is stored in the
+#            record), created_at in microseconds (i64)
+#   ids      byte length (u32) followed by the todo IDs joined with NUL bytes
+#   times    (since version 2) count (u32) followed by one entry per todo with
+#            a due or reminder time: position in the index (u32), due_at and
+#            remind_at in microseconds (i64, NO_TIME if unset)
+#   records  per todo: payload length (u32), updated_at (i64), then the byte
+#            lengths of title (u32), description (u32) and custom priority
+#            name (u16), followed by those UTF-8 strings
+#
+# Everything needed to build the store's indexes is in the index, ids and
+# times sections, so loading never touches the records; each record is
+# decoded from the memory-mapped file the first time its todo is accessed.
+# Version 1 snapshots (without the times section) are still read.
+MAGIC = b"TODOSNAP"
+VERSION = 2
+CUSTOM_PRIORITY = 255
+NO_TIME = -(1 << 63)
+# Strings from JSON can hold lone surrogates, which strict UTF-8 cannot encode
+TEXT_ERRORS = "surrogatepass"
+
+HEADER = struct.Struct("<8sHHI")
+INDEX_ENTRY = struct.Struct("<QBBq")
+IDS_LENGTH = struct.Struct("<I")
+TIMES_COUNT = struct.Struct("<I")
+TIMES_ENTRY = struct.Struct("<Iqq")
+RECORD_LENGTH = struct.Struct("<I")
+RECORD_HEAD = struct.Struct("<qIIH")
+
+
+def is_binary_snapshot(path: str) -> bool:
+    """Check whether a snapshot file is in the binary format"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_snapshot(f: BinaryIO, records: List[TodoRecord]):
+    """Write todos to a file opened for binary writing"""
+    ids = "\0".join(record.id for record in records).encode("utf-8", TEXT_ERRORS)
+    times = [
+        TIMES_ENTRY.pack(position, _time(record.due_at), _time(record.remind_at))
+        for position, record in enumerate(records)
+        if record.due_at is not None or record.remind_at is not None
+    ]
+    records_start = (HEADER.size + INDEX_ENTRY.size * len(records) + IDS_LENGTH.size + len(ids)
+                     + TIMES_COUNT.size + TIMES_ENTRY.size * len(times))
+
+    index = []
+    payloads = []
+    offset = records_start
+    for record in records:
+        if isinstance(record.priority, int):
+            code, custom = record.priority, b""
+        else:
+            code, custom = CUSTOM_PRIORITY, record.priority.encode("utf-8", TEXT_ERRORS)
+        title = record.title.encode("utf-8", TEXT_ERRORS)
+        description = record.description.encode("utf-8", TEXT_ERRORS)
+        payload = b"".join((
+            RECORD_HEAD.pack(record.updated_at, len(title), len(description), len(custom)),
+            title, description, custom
+        ))
+        index.append(INDEX_ENTRY.pack(offset, record.completed, code, record.created_at))
+        payloads.append(RECORD_LENGTH.pack(len(payload)))
+        payloads.append(payload)
+        offset += RECORD_LENGTH.size + len(payload)
+
+    f.write(HEADER.pack(MAGIC, VERSION, 0, len(records)))
+    f.write(b"".join(index))
+    f.write(IDS_LENGTH.pack(len(ids)))
+    f.write(ids)
+    f.write(TIMES_COUNT.pack(len(times)))
+    f.write(b"".join(times))
+    f.write(b"".join(payloads))
+
+
+def _time(micros: Optional[int]) -> int:
+    return NO_TIME if micros is None else micros
+
+
+def _optional_time(value: int) -> Optional[int]:
+    return None if value == NO_TIME else value
+
+
+class BinarySnapshot:
+    """Read-only, memory-mapped view of a binary snapshot file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary todo snapshot")
+        if version not in (1, VERSION):
+            raise ValueError(f"{path} has unsupported snapshot version {version}")
+        self._index_start = HEADER.size
+        ids_start = self._index_start + INDEX_ENTRY.size * self.count
+        (ids_length,) = IDS_LENGTH.unpack_from(self._map, ids_start)
+        ids_start += IDS_LENGTH.size
+        self._ids_range = (ids_start, ids_start + ids_length)
+        self._times: Dict[int, Tuple[Optional[int], Optional[int]]] = {}
+        if version >= 2:
+            times_start = self._ids_range[1]
+            (times_count,) = TIMES_COUNT.unpack_from(self._map, times_start)
+            times_start += TIMES_COUNT.size
+            times_end = times_start + TIMES_ENTRY.size * times_count
+            for position, due_at, remind_at in TIMES_ENTRY.iter_unpack(self._map[times_start:times_end]):
+                self._times[position] = (_optional_time(due_at), _optional_time(remind_at))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def ids(self) -> List[str]:
+        """Return the IDs of all todos, in snapshot order"""
+        if not self.count:
+            return []
+        return self._map[self._ids_range[0]:self._ids_range[1]].decode("utf-8", TEXT_ERRORS).split("\0")
+
+    def times(self) -> Dict[int, Tuple[Optional[int], Optional[int]]]:
+        """Return (due_at, remind_at) by snapshot position, for the todos that have either"""
+        return self._times
+
+    def entries(self) -> Iterator[Tuple[int, int, int, int]]:
+        """Yield (offset, completed, priority code, created_at) for each todo, in snapshot order"""
+        end = self._index_start + INDEX_ENTRY.size * self.count
+        return INDEX_ENTRY.iter_unpack(self._map[self._index_start:end])
+
+    def record(self, position: int, todo_id: str) -> TodoRecord:
+        """Decode the todo at a position in snapshot order"""
+        offset, completed, code, created_at = INDEX_ENTRY.unpack_from(
+            self._map, self._index_start + INDEX_ENTRY.size * position
+        )
+        start = offset + RECORD_LENGTH.size
+        updated_at, title_length, description_length, custom_length = RECORD_HEAD.unpack_from(self._map, start)
+        start += RECORD_HEAD.size
+        title = self._map[start:start + title_length].decode("utf-8", TEXT_ERRORS)
+        start += title_length
+        description = self._map[start:start + description_length].decode("utf-8", TEXT_ERRORS)
+        start += description_length
+        priority = self._map[start:start + custom_length].decode("utf-8", TEXT_ERRORS) if code == CUSTOM_PRIORITY else code
+        due_at, remind_at = self._times.get(position, (None, None))
+        return TodoRecord(todo_id, title, description, priority, bool(completed), created_at, updated_at,
+                          due_at, remind_at)
+
+    def close(self):
+        self._map.close()
+
+
+def convert(source: str, target: str):
+    """Convert a JSON todo store (snapshot plus mutation log) to a binary snapshot"""
+    from storage import TodoLog, listing_key
+
+    todos = sorted(TodoLog(source).load().values(), key=listing_key)
+    tmp_path = target + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        write_snapshot(f, [TodoRecord.from_dict(todo) for todo in todos])
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, target)
+    if os.path.abspath(target) == os.path.abspath(source):
+        # The log is now part of the snapshot
+        open(source + ".log", 'w').close()
+    return len(todos)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a JSON todo store to a binary snapshot")
+    parser.add_argument("source", help="JSON todos file (its .log is replayed too)")
+    parser.add_argument("target", help="Binary snapshot file to write; use the source path to convert in place")
+    args = parser.parse_args()
+    count = convert(args.source, args.target)
+    print(f"Wrote {count} todo(s) to {args.target}")
@@ -0,0 +1,1194 @@
+# storage.py
+import bisect
+import gc
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from metrics import Counter, Histogram
+from profiling import phase
+from records import PRIORITY_CODES, TodoRecord, timestamp_to_micros
+from search import InvertedIndex, tokenize
+from snapshot import CUSTOM_PRIORITY, BinarySnapshot, is_binary_snapshot, write_snapshot
+
+# Sort order used for listings: high -> medium -> low, unknown counts as medium
+PRIORITY_ORDER = PRIORITY_CODES
+PRIORITY_RANKS = sorted(set(PRIORITY_ORDER.values()))
+
+# Compact the log into a fresh snapshot once it holds this many records
+# (or as many records as the last snapshot held todos, whichever is larger),
+# which keeps the amortized cost of a write O(1) and replay time proportional
+# to the store.
+COMPACT_MIN_RECORDS = 1000
+
+# Pause of the writer thread before it retries a failed write
+FLUSH_RETRY_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+STORE_LOAD_SECONDS = Histogram("todo_store_load_seconds", "Time to open a todo store and load its todos", ["backend"])
+STORE_WRITE_SECONDS = Histogram(
+    "todo_store_write_seconds", "Time to persist changes, by kind (log append, snapshot, SQLite commit)", ["kind"]
+)
+STORE_BYTES_WRITTEN = Counter("todo_store_bytes_written_total", "Bytes written to todo logs and snapshots", ["kind"])
+
+
+class TodoLog:
+    """Append-only mutation log with periodic compaction into a JSON snapshot.
+
+    The snapshot keeps the original todos.json shape (a dict of todos keyed by
+    ID), so existing data files load unchanged. Every mutation appends one
+    compact JSON line to ``<snapshot>.log``; loading replays those lines on top
+    of the snapshot.
+
+    Mutations are only queued; a dedicated writer thread appends them to the
+    log, so callers never wait on disk I/O. With a non-zero ``commit_window``
+    (seconds) the writer waits that long after the first queued mutation and
+    writes everything queued within the window in a single append (group
+    commit). ``close()`` flushes whatever is still queued.
+
+    Mutations made inside ``batch()`` are written as one log line, so a batch
+    is replayed either completely or not at all.
+
+    ``snapshot`` returns the current todos as TodoRecords and is called when
+    the log is compacted. The records must not be modified afterwards, as the
+    writer thread encodes them in the background; the compaction takes its
+    place in the queue, so mutations queued after it stay in the log.
+    Snapshots are written as JSON or, with
+    ``snapshot_format="binary"``, in the memory-mappable format of
+    snapshot.py; either format is recognised when loading.
+    """
+
+    def __init__(self, snapshot_path: str, snapshot: Optional[Callable[[], List[TodoRecord]]] = None,
+                 compact_min: int = COMPACT_MIN_RECORDS, commit_window: float = 0.0, fsync: bool = False,
+                 snapshot_format: str = "json"):
+        self.snapshot_path = snapshot_path
+        self.log_path = snapshot_path + ".log"
+        self.snapshot = snapshot
+        self.snapshot_format = snapshot_format
+        self.compact_min = compact_min
+        self.commit_window = commit_window
+        self.fsync = fsync
+        # Number of todos in the snapshot file
+        self._snapshot_size = 0
+        self._log_file = None
+        self._log_records = 0
+        # Encoded records and pending snapshots (lists of TodoRecords) waiting
+        # to be written, in order, guarded by _queue_lock
+        self._queue: List[Union[str, List[TodoRecord]]] = []
+        self._queue_lock = threading.Lock()
+        # Serializes writing the queue between the writer thread and flush()
+        self._io_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._closing = False
+        # Encoded records of the batch in progress, if any
+        self._batch: List[str] = []
+        self._batch_depth = 0
+
+    def load(self) -> Dict[str, Dict]:
+        """Read the snapshot and replay the log on top of it"""
+        snapshot = self.read_snapshot()
+        if isinstance(snapshot, BinarySnapshot):
+            todos = {
+                todo_id: snapshot.record(position, todo_id).to_dict()
+                for position, todo_id in enumerate(snapshot.ids())
+            }
+            snapshot.close()
+        else:
+            todos = snapshot
+        for record in self.replay():
+            if record["op"] == "put":
+                todos[record["todo"]["id"]] = record["todo"]
+            else:
+                todos.pop(record["id"], None)
+        return todos
+
+    def read_snapshot(self) -> Union[Dict[str, Dict], BinarySnapshot]:
+        """Open the snapshot: a dict of todos for JSON, a BinarySnapshot for the binary format"""
+        if is_binary_snapshot(self.snapshot_path):
+            snapshot = BinarySnapshot(self.snapshot_path)
+            self._snapshot_size = len(snapshot)
+            return snapshot
+
+        todos: Dict[str, Dict] = {}
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    todos = json.load(f)
+            except (OSError, ValueError):
+                todos = {}
+        self._snapshot_size = len(todos)
+        return todos
+
+    def replay(self) -> List[Dict]:
+        """Return the put/del records in the log, with batches flattened
+
+        A torn final line from an interrupted append is cut off the log, so
+        the next append starts on a line of its own instead of joining it.
+        """
+        records: List[Dict] = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb+') as f:
+                # Byte offset of the end of the last complete line
+                good = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self._flatten(record, records)
+                    good += len(line)
+                size = f.seek(0, os.SEEK_END)
+                if good < size:
+                    logger.warning(f"Dropping {size - good} bytes of a torn append at the end of {self.log_path}")
+                    f.truncate(good)
+        self._log_records = len(records)
+        return records
+
+    def put(self, todo: Dict):
+        """Record a created or updated todo"""
+        self._append([{"op": "put", "todo": todo}])
+
+    def delete(self, todo_ids: Iterable[str]):
+        """Record one or more deleted todos"""
+        self._append([{"op": "del", "id": todo_id} for todo_id in todo_ids])
+
+    @contextmanager
+    def batch(self):
+        """Group the mutations recorded inside the block into a single log line
+
+        If the block raises, nothing it recorded is written.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            if self._batch_depth == 1:
+                self._batch = []
+            raise
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch:
+                records = self._batch
+                self._batch = []
+                self._enqueue('{"op":"batch","records":[' + ','.join(records) + ']}\n', len(records))
+
+    def flush(self):
+        """Write all queued records and snapshots
+
+        If writing fails, the items go back to the front of the queue, so the
+        next flush writes them again instead of dropping them.
+        """
+        with self._io_lock:
+            with self._queue_lock:
+                items = self._queue
+                self._queue = []
+            try:
+                self._write(items)
+            except BaseException:
+                with self._queue_lock:
+                    self._queue[:0] = items
+                raise
+
+    def _write(self, items: List[Union[str, List[TodoRecord]]]):
+        data: List[str] = []
+        for item in items:
+            if isinstance(item, str):
+                data.append(item)
+            elif self._write_snapshot(item):
+                # Everything queued before the snapshot is part of it
+                data.clear()
+        if not data:
+            return
+        encoded = ''.join(data)
+        with STORE_WRITE_SECONDS.time(kind="log"), phase("log write"):
+            if self._log_file is None:
+                self._log_file = open(self.log_path, 'a')
+            start = os.fstat(self._log_file.fileno()).st_size
+            try:
+                self._log_file.write(encoded)
+                self._log_file.flush()
+                if self.fsync:
+                    os.fsync(self._log_file.fileno())
+            except BaseException:
+                self._cut_log(start)
+                raise
+        # Records are ASCII-only JSON, so characters are bytes
+        STORE_BYTES_WRITTEN.inc(len(encoded), kind="log")
+
+    def compact(self):
+        """Write the current todos to a new snapshot and truncate the log"""
+        self._enqueue_snapshot()
+        self.flush()
+
+    def close(self):
+        """Stop the writer thread and write anything still queued"""
+        if self._flusher is not None:
+            self._closing = True
+            self._flush_requested.set()
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        self._close_log()
+
+    def _append(self, records):
+        if not records:
+            return
+        encoded = [json.dumps(r, separators=(',', ':')) for r in records]
+        if self._batch_depth:
+            self._batch.extend(encoded)
+        else:
+            self._enqueue(''.join(line + '\n' for line in encoded), len(encoded))
+
+    def _enqueue(self, data: str, count: int):
+        with self._queue_lock:
+            self._queue.append(data)
+            self._log_records += count
+            compact = self.snapshot is not None and self._log_records >= max(self.compact_min, self._snapshot_size)
+        if compact:
+            self._enqueue_snapshot()
+
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name="todo-log-writer", daemon=True)
+            self._flusher.start()
+        self._flush_requested.set()
+
+    def _enqueue_snapshot(self):
+        with self._queue_lock:
+            records = self.snapshot()
+            self._queue.append(records)
+            self._snapshot_size = len(records)
+            self._log_records = 0
+
+    def _write_snapshot(self, records: List[TodoRecord]) -> bool:
+        """Replace the snapshot file with records and truncate the log; False if writing failed"""
+        tmp_path = self.snapshot_path + ".tmp"
+        began = time.perf_counter()
+        try:
+            with phase("snapshot write"), open(tmp_path, 'wb') as f:
+                if self.snapshot_format == "binary":
+                    write_snapshot(f, records)
+                else:
+                    todos = {record.id: record.to_dict() for record in records}
+                    f.write(json.dumps(todos, separators=(',', ':')).encode())
+                f.flush()
+                os.fsync(f.fileno())
+                size = f.tell()
+            os.replace(tmp_path, self.snapshot_path)
+            STORE_WRITE_SECONDS.observe(time.perf_counter() - began, kind="snapshot")
+            STORE_BYTES_WRITTEN.inc(size, kind="snapshot")
+        except OSError:
+            # The log still holds every mutation, so nothing is lost
+            logger.exception("Failed to write the todo snapshot")
+            return False
+
+        # Replaying the old log over the new snapshot is harmless, so a crash
+        # before the truncate below only costs a longer replay.
+        self._close_log()
+        open(self.log_path, 'w').close()
+        return True
+
+    def _flush_loop(self):
+        while not self._closing:
+            self._flush_requested.wait()
+            if self.commit_window > 0:
+                # Let the rest of a burst join this commit
+                time.sleep(self.commit_window)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The records stay queued; try again after a pause
+                logger.exception("Failed to write the todo log")
+                time.sleep(FLUSH_RETRY_SECONDS)
+                self._flush_requested.set()
+
+    def _close_log(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+
+    def _cut_log(self, size: int):
+        """Close the log after a failed append and cut off any part of it that was written"""
+        log_file, self._log_file = self._log_file, None
+        try:
+            log_file.close()
+        except OSError:
+            pass
+        try:
+            os.truncate(self.log_path, size)
+        except OSError:
+            logger.exception("Failed to cut a partial append off the todo log")
+
+    @classmethod
+    def _flatten(cls, record: Dict, records: List[Dict]):
+        if record.get("op") in ("put", "del"):
+            records.append(record)
+        elif record.get("op") == "batch":
+            for inner in record["records"]:
+                cls._flatten(inner, records)
+
+
+class TodoStore:
+    """Interface the MCP tools use to read and write todos.
+
+    Listings are always ordered by priority (high -> medium -> low) and then
+    by creation time, which is also the order complete_todo_by_number uses.
+    A todo's position in that order is given by listing_key().
+    """
+
+    # Incremented by every mutation, so callers can tell when cached reads are stale
+    version = 0
+
+    def count(self, filter_by: str = "all") -> int:
+        """Return how many todos match 'all', 'completed' or 'pending'"""
+        raise NotImplementedError
+
+    def get(self, todo_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def add(self, todo: Dict):
+        raise NotImplementedError
+
+    def update(self, todo_id: str, changes: Dict) -> Optional[Dict]:
+        """Apply field changes to a todo and return the updated todo"""
+        raise NotImplementedError
+
+    def delete(self, todo_id: str) -> Optional[Dict]:
+        """Delete a todo and return it"""
+        raise NotImplementedError
+
+    def clear_completed(self) -> int:
+        """Delete all completed todos and return how many were removed"""
+        raise NotImplementedError
+
+    def batch(self):
+        """Return a context manager that persists all mutations inside it together
+
+        If the block raises, all of its mutations are undone, like a rolled
+        back transaction.
+        """
+        raise NotImplementedError
+
+    def list(self, filter_by: str = "all", after: Optional[Tuple] = None,
+             limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        """Return todos matching 'all', 'completed' or 'pending' in listing order
+
+        Args:
+            filter_by: Status filter
+            after: Only return todos whose listing_key() is greater than this
+            limit: Maximum number of todos to return
+            offset: Number of matching todos to skip
+        """
+        raise NotImplementedError
+
+    def pending_at(self, position: int) -> Optional[Dict]:
+        """Return the pending todo at a 1-based position in listing order"""
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int = 10, filter_by: str = "all") -> List[Dict]:
+        """Return the todos whose title or description best match a free text query
+
+        Query words also match words they are a prefix of; results are ordered
+        by relevance, best first.
+        """
+        raise NotImplementedError
+
+    def due(self, until: Optional[str] = None, since: Optional[str] = None,
+            limit: Optional[int] = None, field: str = "due_at") -> List[Dict]:
+        """Return pending todos with a due time in [since, until], earliest first
+
+        Args:
+            until: Latest time to include (ISO timestamp), unbounded if None
+            since: Earliest time to include (ISO timestamp), unbounded if None
+            limit: Maximum number of todos to return
+            field: 'due_at', or 'remind_at' to query reminder times instead
+        """
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        """Return total/completed/pending counts and pending counts per priority"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def gc_paused():
+    """Pause the cyclic garbage collector while loading a store
+
+    Loading creates an object or more for every todo, and all of them stay
+    alive, so the collections they would trigger only rescan them for nothing.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def listing_key(todo: Dict) -> Tuple[int, str, str]:
+    """Sort key of a todo in listings"""
+    return (PRIORITY_ORDER.get(todo["priority"], 1), todo["created_at"], todo["id"])
+
+
+STATUS_FILTERS = {"all": (False, True), "completed": (True,), "pending": (False,)}
+
+# Optional times of a todo that due() can query
+TIME_FIELDS = ("due_at", "remind_at")
+
+
+class JsonStore(TodoStore):
+    """In-memory todos persisted through a TodoLog.
+
+    Todos are held as compact TodoRecords and converted to dicts only when
+    they are returned or written to the log. Secondary indexes (IDs of
+    completed todos, and IDs of pending todos per priority) are kept up to
+    date on every mutation, so stats are O(1) and filtered listings only touch
+    the todos they return. Listing order is kept in sorted (created_at, id)
+    lists per status and priority, so listings never re-sort and
+    complete_todo_by_number finds a position directly. Pending todos with a
+    due or reminder time are also kept in sorted (time, id) lists, so due()
+    finds its range by bisection and only touches the todos it returns.
+    Titles and descriptions are kept in an InvertedIndex for search(), built
+    on the first search.
+
+    When the snapshot is binary, the indexes are built from its index section
+    alone and each record is decoded from the mapped file on first access.
+    """
+
+    def __init__(self, path: str, commit_window: float = 0.0, fsync: bool = False,
+                 snapshot_format: str = "json"):
+        self.log = TodoLog(path, snapshot=self._snapshot, commit_window=commit_window, fsync=fsync,
+                           snapshot_format=snapshot_format)
+        # Keyed by the record's own id string, so it is stored only once. Todos
+        # not yet decoded from a binary snapshot hold their snapshot position.
+        self.records: Dict[str, Union[TodoRecord, int]] = {}
+        self._binary: Optional[BinarySnapshot] = None
+        self._completed: Set[str] = set()
+        self._pending: Dict[object, Set[str]] = {}
+        # None until first needed after loading a binary snapshot, see _ordering()
+        self._order: Optional[Dict[Tuple[bool, int], List[Tuple[int, str]]]] = {}
+        self._times: Dict[str, List[Tuple[int, str]]] = {field: [] for field in TIME_FIELDS}
+        self._text: Optional[InvertedIndex] = None
+        # Records of the todos changed in the batch in progress, as they were before it
+        self._undo: Optional[Dict[str, Optional[TodoRecord]]] = None
+        self._load()
+
+    def count(self, filter_by: str = "all") -> int:
+        if filter_by == "all":
+            return len(self.records)
+        if filter_by == "completed":
+            return len(self._completed)
+        if filter_by == "pending":
+            return len(self.records) - len(self._completed)
+        return 0
+
+    def get(self, todo_id: str) -> Optional[Dict]:
+        record = self._record(todo_id)
+        return record.to_dict() if record else None
+
+    def add(self, todo: Dict):
+        record = TodoRecord.from_dict(todo)
+        self._remember(record.id)
+        self._put(record)
+        self.version += 1
+        self.log.put(record.to_dict())
+
+    def update(self, todo_id: str, changes: Dict) -> Optional[Dict]:
+        old = self._record(todo_id)
+        if old is None:
+            return None
+        self._remember(todo_id)
+        # Records are never changed in place, see _snapshot()
+        record = old.copy()
+        record.apply(changes)
+        self._unindex(old)
+        self.records[todo_id] = record
+        self._index(record)
+        if self._text is not None and ("title" in changes or "description" in changes):
+            self._text.add(todo_id, record.title, record.description)
+        self.version += 1
+        todo = record.to_dict()
+        self.log.put(todo)
+        return todo
+
+    def delete(self, todo_id: str) -> Optional[Dict]:
+        self._remember(todo_id)
+        record = self._remove(todo_id)
+        if record is None:
+            return None
+        self.version += 1
+        self.log.delete([todo_id])
+        return record.to_dict()
+
+    @contextmanager
+    def batch(self):
+        outermost = self._undo is None
+        if outermost:
+            self._undo = {}
+        try:
+            with self.log.batch():
+                yield
+        except BaseException:
+            if outermost:
+                self._rollback(self._undo)
+            raise
+        finally:
+            if outermost:
+                self._undo = None
+
+    def clear_completed(self) -> int:
+        completed_ids = list(self._completed)
+        for todo_id in completed_ids:
+            self._remember(todo_id)
+            del self.records[todo_id]
+            if self._text is not None:
+                self._text.remove(todo_id)
+        self._completed.clear()
+        if self._order is not None:
+            for rank in PRIORITY_RANKS:
+                self._order.pop((True, rank), None)
+        if completed_ids:
+            self.version += 1
+        self.log.delete(completed_ids)
+        return len(completed_ids)
+
+    def list(self, filter_by: str = "all", after: Optional[Tuple] = None,
+             limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        statuses = STATUS_FILTERS.get(filter_by)
+        if statuses is None:
+            return []
+        stop = None if limit is None else offset + limit
+        return [record.to_dict() for record in itertools.islice(self._iter_order(statuses, after), offset, stop)]
+
+    def pending_at(self, position: int) -> Optional[Dict]:
+        if position < 1:
+            return None
+        index = position - 1
+        order = self._ordering()
+        for rank in PRIORITY_RANKS:
+            keys = order.get((False, rank), ())
+            if index < len(keys):
+                return self._record(keys[index][1]).to_dict()
+            index -= len(keys)
+        return None
+
+    def search(self, query: str, limit: int = 10, filter_by: str = "all") -> List[Dict]:
+        if filter_by == "completed":
+            accept = self._completed.__contains__
+        elif filter_by == "pending":
+            accept = lambda todo_id: todo_id not in self._completed
+        elif filter_by == "all":
+            accept = None
+        else:
+            return []
+        if self._text is None:
+            self._text = InvertedIndex()
+            for todo_id in list(self.records):
+                record = self._record(todo_id)
+                self._text.add(todo_id, record.title, record.description)
+        return [self._record(todo_id).to_dict() for todo_id, _ in self._text.search(query, limit, accept)]
+
+    def due(self, until: Optional[str] = None, since: Optional[str] = None,
+            limit: Optional[int] = None, field: str = "due_at") -> List[Dict]:
+        keys = self._times.get(field)
+        if keys is None:
+            return []
+        start = 0 if since is None else bisect.bisect_left(keys, (timestamp_to_micros(since),))
+        end = len(keys) if until is None else bisect.bisect_left(keys, (timestamp_to_micros(until) + 1,))
+        if limit is not None:
+            end = min(end, start + limit)
+        return [self._record(todo_id).to_dict() for _, todo_id in keys[start:end]]
+
+    def stats(self) -> Dict[str, int]:
+        completed = len(self._completed)
+        stats = {"total": len(self.records), "completed": completed, "pending": len(self.records) - completed}
+        for priority, code in PRIORITY_CODES.items():
+            stats[priority] = len(self._pending.get(code, ()))
+        return stats
+
+    def close(self):
+        self.log.close()
+        self._release_binary()
+
+    def _load(self):
+        """Build the records and indexes from the snapshot, then replay the log"""
+        with gc_paused():
+            self._load_snapshot()
+        for entry in self.log.replay():
+            if entry["op"] == "put":
+                self._put(TodoRecord.from_dict(entry["todo"]))
+            else:
+                self._remove(entry["id"])
+
+    def _load_snapshot(self):
+        snapshot = self.log.read_snapshot()
+        if isinstance(snapshot, BinarySnapshot):
+            self._binary = snapshot
+            # Building the ordering lists would cost a tuple per todo, so they
+            # wait for the first listing, see _ordering()
+            self._order = None
+            self._load_binary(snapshot)
+        else:
+            self._load_todos(snapshot.values())
+            # Snapshots are usually written in listing order, making this linear
+            for keys in self._order.values():
+                keys.sort()
+        for keys in self._times.values():
+            keys.sort()
+
+    def _load_binary(self, snapshot: BinarySnapshot):
+        """Add the todos of a binary snapshot, leaving them undecoded"""
+        records, completed_ids, pending = self.records, self._completed, self._pending
+        times = snapshot.times()
+        for position, (todo_id, (_, completed, code, created_at)) in enumerate(zip(snapshot.ids(), snapshot.entries())):
+            if code == CUSTOM_PRIORITY:
+                # The priority name is in the record, so decode it now
+                record = snapshot.record(position, todo_id)
+                records[todo_id] = record
+                self._index(record, presorted=True)
+                continue
+            records[todo_id] = position
+            if position in times:
+                self._index_fields(todo_id, bool(completed), code, code, created_at, times[position], presorted=True)
+            elif completed:
+                completed_ids.add(todo_id)
+            else:
+                ids = pending.get(code)
+                if ids is None:
+                    ids = pending[code] = set()
+                ids.add(todo_id)
+
+    def _ordering(self) -> Dict[Tuple[bool, int], List[Tuple[int, str]]]:
+        """Return the ordering lists, building them on first use after loading a binary snapshot"""
+        if self._order is None:
+            order = {}
+            with gc_paused():
+                entries = list(self._binary.entries())
+                for todo_id, record in self.records.items():
+                    if isinstance(record, int):
+                        _, completed, code, created_at = entries[record]
+                        group = (bool(completed), code)
+                    else:
+                        created_at, group = record.created_at, (record.completed, record.rank)
+                    keys = order.get(group)
+                    if keys is None:
+                        keys = order[group] = []
+                    keys.append((created_at, todo_id))
+                for keys in order.values():
+                    keys.sort()
+            self._order = order
+        return self._order
+
+    def _load_todos(self, todos: Iterable[Dict]):
+        """Add the todos of a JSON snapshot, unsorted
+
+        This runs for every todo at startup, so _index_fields() is inlined
+        for the todos without due or reminder times.
+        """
+        records, completed_ids, pending, order = self.records, self._completed, self._pending, self._order
+        from_dict = TodoRecord.from_dict
+        for todo in todos:
+            record = from_dict(todo)
+            todo_id = record.id
+            records[todo_id] = record
+            if record.due_at is not None or record.remind_at is not None:
+                self._index(record, presorted=True)
+                continue
+            if record.completed:
+                completed_ids.add(todo_id)
+            else:
+                ids = pending.get(record.priority)
+                if ids is None:
+                    ids = pending[record.priority] = set()
+                ids.add(todo_id)
+            group = (record.completed, record.rank)
+            keys = order.get(group)
+            if keys is None:
+                keys = order[group] = []
+            keys.append((record.created_at, todo_id))
+
+    def _remember(self, todo_id: str):
+        """Keep a todo's record from before the batch in progress, to undo the batch"""
+        if self._undo is not None and todo_id not in self._undo:
+            self._undo[todo_id] = self._record(todo_id)
+
+    def _rollback(self, undo: Dict[str, Optional[TodoRecord]]):
+        """Restore the todos changed by a failed batch; its log line is never written"""
+        for todo_id, record in undo.items():
+            self._remove(todo_id)
+            if record is not None:
+                self._put(record)
+        self.version += 1
+
+    def _record(self, todo_id: str) -> Optional[TodoRecord]:
+        record = self.records.get(todo_id)
+        if isinstance(record, int):
+            record = self.records[todo_id] = self._binary.record(record, todo_id)
+        return record
+
+    def _put(self, record: TodoRecord):
+        old = self._record(record.id)
+        if old is not None:
+            self._unindex(old)
+        self.records[record.id] = record
+        self._index(record)
+        if self._text is not None:
+            self._text.add(record.id, record.title, record.description)
+
+    def _remove(self, todo_id: str) -> Optional[TodoRecord]:
+        record = self._record(todo_id)
+        if record is not None:
+            del self.records[todo_id]
+            self._unindex(record)
+            if self._text is not None:
+                self._text.remove(todo_id)
+        return record
+
+    def _snapshot(self) -> List[TodoRecord]:
+        # The log's writer thread encodes these records while the store keeps
+        # changing, which is safe because updates replace records instead of
+        # modifying them.
+        records = list(self._iter_order((False, True), None))
+        # Every todo is decoded now, so the old snapshot is no longer needed
+        self._release_binary()
+        return records
+
+    def _release_binary(self):
+        if self._binary is not None:
+            self._binary.close()
+            self._binary = None
+
+    def _index(self, record: TodoRecord, presorted: bool = False):
+        self._index_fields(record.id, record.completed, record.priority, record.rank, record.created_at,
+                           (record.due_at, record.remind_at), presorted)
+
+    def _index_fields(self, todo_id: str, completed: bool, priority, rank: int, created_at: int,
+                      times: Tuple[Optional[int], Optional[int]] = (None, None), presorted: bool = False):
+        # Runs for every todo when a store loads, so kept to the cases that apply
+        if completed:
+            self._completed.add(todo_id)
+        else:
+            pending = self._pending.get(priority)
+            if pending is None:
+                pending = self._pending[priority] = set()
+            pending.add(todo_id)
+            if times[0] is not None or times[1] is not None:
+                for field, moment in zip(TIME_FIELDS, times):
+                    if moment is None:
+                        continue
+                    if presorted:
+                        self._times[field].append((moment, todo_id))
+                    else:
+                        bisect.insort(self._times[field], (moment, todo_id))
+        if self._order is None:
+            return
+        keys = self._order.get((completed, rank))
+        if keys is None:
+            keys = self._order[(completed, rank)] = []
+        key = (created_at, todo_id)
+        # New todos (with time-ordered IDs) sort last, so they are appended
+        if presorted or not keys or keys[-1] < key:
+            keys.append(key)
+        else:
+            bisect.insort(keys, key)
+
+    def _unindex(self, record: TodoRecord):
+        if record.completed:
+            self._completed.discard(record.id)
+        else:
+            self._pending.get(record.priority, set()).discard(record.id)
+            for field, moment in zip(TIME_FIELDS, (record.due_at, record.remind_at)):
+                if moment is not None:
+                    self._discard(self._times[field], (moment, record.id))
+        if self._order is not None:
+            self._discard(self._order.get((record.completed, record.rank), []), (record.created_at, record.id))
+
+    @staticmethod
+    def _discard(keys: List[Tuple[int, str]], key: Tuple[int, str]):
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def _iter_order(self, statuses, after: Optional[Tuple]):
+        """Yield records with the given statuses in listing order, starting after a listing_key()"""
+        order = self._ordering()
+        for rank in PRIORITY_RANKS:
+            if after is not None and rank < after[0]:
+                continue
+            runs = []
+            for status in statuses:
+                keys = order.get((status, rank), [])
+                start = 0
+                if after is not None and rank == after[0]:
+                    start = bisect.bisect_right(keys, (timestamp_to_micros(after[1]), after[2]))
+                runs.append(map(keys.__getitem__, range(start, len(keys))))
+            for _, todo_id in heapq.merge(*runs):
+                yield self._record(todo_id)
+
+
+class SQLiteStore(TodoStore):
+    """Todos kept in a SQLite database (WAL mode) instead of in memory.
+
+    Listings, stats and position lookups are answered from indexes on
+    (completed, priority, created_at), so memory use does not grow with the
+    number of todos; due() uses partial indexes on the due and reminder times
+    of pending todos. Search uses an FTS5 table kept in sync by triggers.
+
+    Several processes can share the database. Writes run in BEGIN IMMEDIATE
+    transactions, waiting up to ``busy_timeout`` seconds for other writers,
+    and ``version`` also changes when another process commits, so their
+    writes invalidate cached responses here. WAL mode needs all processes on
+    one host; use another ``journal_mode`` (e.g. 'delete') on network file
+    systems.
+    """
+
+    JOURNAL_MODES = ("wal", "delete", "truncate", "persist")
+
+    COLUMNS = ("id", "title", "description", "priority", "completed", "created_at", "updated_at",
+               "due_at", "remind_at")
+    _select = ", ".join(COLUMNS)
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS todos (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL DEFAULT '',
+            priority TEXT NOT NULL,
+            priority_rank INTEGER NOT NULL,
+            completed INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            due_at TEXT,
+            remind_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS todos_by_status
+            ON todos (completed, priority_rank, created_at, id);
+        CREATE INDEX IF NOT EXISTS todos_by_priority
+            ON todos (priority_rank, created_at, id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5(
+            title, description, content='todos', content_rowid='rowid'
+        );
+        CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN
+            INSERT INTO todos_fts (rowid, title, description)
+                VALUES (new.rowid, new.title, new.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN
+            INSERT INTO todos_fts (todos_fts, rowid, title, description)
+                VALUES ('delete', old.rowid, old.title, old.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS todos_fts_update AFTER UPDATE OF title, description ON todos BEGIN
+            INSERT INTO todos_fts (todos_fts, rowid, title, description)
+                VALUES ('delete', old.rowid, old.title, old.description);
+            INSERT INTO todos_fts (rowid, title, description)
+                VALUES (new.rowid, new.title, new.description);
+        END;
+    """
+
+    # Created after databases from before due dates have gained the columns
+    TIME_SCHEMA = """
+        CREATE INDEX IF NOT EXISTS todos_by_due_at
+            ON todos (due_at, id) WHERE completed = 0 AND due_at IS NOT NULL;
+        CREATE INDEX IF NOT EXISTS todos_by_remind_at
+            ON todos (remind_at, id) WHERE completed = 0 AND remind_at IS NOT NULL;
+    """
+
+    UPSERT = """
+        INSERT INTO todos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            title = excluded.title, description = excluded.description,
+            priority = excluded.priority, priority_rank = excluded.priority_rank,
+            completed = excluded.completed, created_at = excluded.created_at,
+            updated_at = excluded.updated_at, due_at = excluded.due_at,
+            remind_at = excluded.remind_at
+    """
+
+    def __init__(self, path: str, journal_mode: str = "wal", busy_timeout: float = 5.0):
+        if journal_mode not in self.JOURNAL_MODES:
+            raise ValueError(f"Unsupported SQLite journal mode: {journal_mode}")
+        self.path = path
+        self._transaction_depth = 0
+        self._version = 0
+        # Calls come from worker threads; callers serialize them (see tenants.StoreRegistry).
+        # Transactions are begun explicitly by _transaction().
+        self.conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self._data_version = self._read_data_version()
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        has_fts = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'todos_fts'").fetchone()
+        self.conn.executescript(self.SCHEMA)
+        if not has_fts:
+            # Index todos stored before search existed
+            with self._transaction():
+                self.conn.execute("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')")
+        if self._missing_time_fields():
+            # Databases created before due dates; checked again under the write
+            # lock, as another process may be adding the columns too
+            with self._transaction():
+                for field in self._missing_time_fields():
+                    self.conn.execute(f"ALTER TABLE todos ADD COLUMN {field} TEXT")
+        self.conn.executescript(self.TIME_SCHEMA)
+
+    @property
+    def version(self) -> int:
+        # data_version changes when another connection commits
+        data_version = self._read_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._version += 1
+        return self._version
+
+    @version.setter
+    def version(self, value: int):
+        self._version = value
+
+    def import_todos(self, todos: Iterable[Dict]):
+        """Bulk-load todos, e.g. from an existing JSON store"""
+        with self._transaction():
+            self.conn.executemany(self.UPSERT, [self._params(todo) for todo in todos])
+
+    def count(self, filter_by: str = "all") -> int:
+        if filter_by not in STATUS_FILTERS:
+            return 0
+        where, params = self._status_filter(filter_by)
+        return self.conn.execute(f"SELECT COUNT(*) FROM todos {where}", params).fetchone()[0]
+
+    def get(self, todo_id: str) -> Optional[Dict]:
+        row = self.conn.execute(f"SELECT {self._select} FROM todos WHERE id = ?", (todo_id,)).fetchone()
+        return self._todo(row) if row else None
+
+    def add(self, todo: Dict):
+        with self._transaction():
+            self.conn.execute(self.UPSERT, self._params(todo))
+
+    def update(self, todo_id: str, changes: Dict) -> Optional[Dict]:
+        # Read and write in one transaction, so a concurrent writer's changes are not lost
+        with self._transaction():
+            todo = self.get(todo_id)
+            if todo is None:
+                return None
+            todo.update(changes)
+            self.conn.execute(self.UPSERT, self._params(todo))
+        for field in TIME_FIELDS:
+            if not todo.get(field):
+                todo.pop(field, None)
+        return todo
+
+    def delete(self, todo_id: str) -> Optional[Dict]:
+        with self._transaction():
+            todo = self.get(todo_id)
+            if todo is not None:
+                self.conn.execute("DELETE FROM todos WHERE id = ?", (todo_id,))
+        return todo
+
+    def batch(self):
+        return self._transaction()
+
+    def clear_completed(self) -> int:
+        with self._transaction():
+            return self.conn.execute("DELETE FROM todos WHERE completed = 1").rowcount
+
+    def list(self, filter_by: str = "all", after: Optional[Tuple] = None,
+             limit: Optional[int] = None, offset: int = 0) -> List[Dict]:
+        if filter_by not in STATUS_FILTERS:
+            return []
+        where, params = self._status_filter(filter_by)
+        if after is not None:
+            where += (" AND" if where else "WHERE") + " (priority_rank, created_at, id) > (?, ?, ?)"
+            params += tuple(after)
+        rows = self.conn.execute(
+            f"SELECT {self._select} FROM todos {where} "
+            "ORDER BY priority_rank, created_at, id LIMIT ? OFFSET ?",
+            params + (-1 if limit is None else limit, offset)
+        )
+        return [self._todo(row) for row in rows]
+
+    def pending_at(self, position: int) -> Optional[Dict]:
+        if position < 1:
+            return None
+        row = self.conn.execute(
+            f"SELECT {self._select} FROM todos WHERE completed = 0 "
+            "ORDER BY priority_rank, created_at, id LIMIT 1 OFFSET ?",
+            (position - 1,)
+        ).fetchone()
+        return self._todo(row) if row else None
+
+    def search(self, query: str, limit: int = 10, filter_by: str = "all") -> List[Dict]:
+        terms = set(tokenize(query))
+        if not terms or filter_by not in STATUS_FILTERS:
+            return []
+        where, params = self._status_filter(filter_by)
+        where = where.replace("WHERE", "AND")
+        match = " OR ".join(f'"{term}"*' for term in sorted(terms))
+        rows = self.conn.execute(
+            f"SELECT {', '.join('todos.' + c for c in self.COLUMNS)} FROM todos_fts "
+            f"JOIN todos ON todos.rowid = todos_fts.rowid WHERE todos_fts MATCH ? {where} "
+            "ORDER BY bm25(todos_fts, 2.0, 1.0) LIMIT ?",
+            (match,) + params + (limit,)
+        )
+        return [self._todo(row) for row in rows]
+
+    def due(self, until: Optional[str] = None, since: Optional[str] = None,
+            limit: Optional[int] = None, field: str = "due_at") -> List[Dict]:
+        if field not in TIME_FIELDS:
+            return []
+        # The conditions match the partial index of the field
+        where, params = f"WHERE completed = 0 AND {field} IS NOT NULL", ()
+        if since is not None:
+            where += f" AND {field} >= ?"
+            params += (since,)
+        if until is not None:
+            where += f" AND {field} <= ?"
+            params += (until,)
+        rows = self.conn.execute(
+            f"SELECT {self._select} FROM todos {where} ORDER BY {field}, id LIMIT ?",
+            params + (-1 if limit is None else limit,)
+        )
+        return [self._todo(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        stats = {"total": 0, "completed": 0, "high": 0, "medium": 0, "low": 0}
+        rows = self.conn.execute("SELECT completed, priority, COUNT(*) FROM todos GROUP BY completed, priority")
+        for completed, priority, count in rows:
+            stats["total"] += count
+            if completed:
+                stats["completed"] += count
+            elif priority in stats:
+                stats[priority] += count
+        stats["pending"] = stats["total"] - stats["completed"]
+        return stats
+
+    def close(self):
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Commit on leaving the outermost block, roll back on errors
+
+        BEGIN IMMEDIATE takes the write lock up front, so reads inside the block
+        see no concurrent writes and other writers wait for the busy timeout.
+        """
+        self._transaction_depth += 1
+        try:
+            if self._transaction_depth > 1:
+                yield
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+                with STORE_WRITE_SECONDS.time(kind="commit"), phase("commit"):
+                    self.conn.execute("COMMIT")
+            except BaseException:
+                # Also after a failed COMMIT (e.g. SQLITE_BUSY), which leaves the transaction open
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self.version += 1
+        finally:
+            self._transaction_depth -= 1
+
+    def _missing_time_fields(self) -> List[str]:
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(todos)")}
+        return [field for field in TIME_FIELDS if field not in columns]
+
+    def _read_data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @staticmethod
+    def _status_filter(filter_by: str):
+        if filter_by == "all":
+            return "", ()
+        return "WHERE completed = ?", (filter_by == "completed",)
+
+    @staticmethod
+    def _params(todo: Dict):
+        return (
+            todo["id"], todo["title"], todo.get("description", ""), todo["priority"],
+            PRIORITY_ORDER.get(todo["priority"], 1), bool(todo["completed"]),
+            todo["created_at"], todo["updated_at"], todo.get("due_at") or None, todo.get("remind_at") or None
+        )
+
+    @staticmethod
+    def _todo(row) -> Dict:
+        todo = dict(row)
+        todo["completed"] = bool(todo["completed"])
+        # Unset times are left out, as in the JSON backend
+        for field in TIME_FIELDS:
+            if todo[field] is None:
+                del todo[field]
+        return todo
+
+
+def open_store(path: str, backend: Optional[str] = None) -> TodoStore:
+    """Open the storage backend selected by TODOS_BACKEND ('json' or 'sqlite')
+
+    The SQLite backend keeps its database next to the JSON file (todos.json ->
+    todos.db) and imports the JSON todos the first time it is opened. The JSON
+    backend group-commits its log writes when TODOS_COMMIT_WINDOW_MS is set,
+    fsyncs every log write when TODOS_FSYNC is set, and writes binary
+    snapshots when TODOS_SNAPSHOT_FORMAT is 'binary'. The SQLite database can
+    be shared by several server processes; TODOS_SQLITE_JOURNAL_MODE and
+    TODOS_SQLITE_BUSY_TIMEOUT_MS tune it for that.
+    """
+    backend = (backend or os.environ.get("TODOS_BACKEND", "json")).lower()
+    with STORE_LOAD_SECONDS.time(backend=backend):
+        return _open_store(path, backend)
+
+
+def _open_store(path: str, backend: str) -> TodoStore:
+    if backend == "json":
+        commit_window = float(os.environ.get("TODOS_COMMIT_WINDOW_MS", 0)) / 1000
+        fsync = os.environ.get("TODOS_FSYNC", "").lower() in ("1", "true", "yes")
+        snapshot_format = os.environ.get("TODOS_SNAPSHOT_FORMAT", "json").lower()
+        return JsonStore(path, commit_window=commit_window, fsync=fsync, snapshot_format=snapshot_format)
+    if backend == "sqlite":
+        db_path = os.path.splitext(path)[0] + ".db"
+        journal_mode = os.environ.get("TODOS_SQLITE_JOURNAL_MODE", "wal").lower()
+        busy_timeout = float(os.environ.get("TODOS_SQLITE_BUSY_TIMEOUT_MS", 5000)) / 1000
+        # Small JSON stores may have only a log, not yet compacted into a snapshot
+        if not os.path.exists(db_path) and (os.path.exists(path) or os.path.exists(path + ".log")):
+            _import_json(path, db_path, busy_timeout)
+        return SQLiteStore(db_path, journal_mode=journal_mode, busy_timeout=busy_timeout)
+    raise ValueError(f"Unknown TODOS_BACKEND: {backend}")
+
+
+def _import_json(path: str, db_path: str, busy_timeout: float):
+    """Create the SQLite database at db_path from the JSON store at path
+
+    The database is built under a temporary name and linked into place only
+    once complete, so a failed import leaves no database behind that would
+    make the next open skip the import. If another process imported first,
+    its database is kept.
+    """
+    tmp_path = f"{db_path}.{os.getpid()}.import"
+    try:
+        # A rollback journal leaves no WAL file behind; the real open switches the mode
+        store = SQLiteStore(tmp_path, journal_mode="delete", busy_timeout=busy_timeout)
+        try:
+            store.import_todos(TodoLog(path).load().values())
+        finally:
+            store.close()
+        try:
+            os.link(tmp_path, db_path)
+        except FileExistsError:
+            pass
+    finally:
+        for leftover in (tmp_path, tmp_path + "-journal"):
+            try:
+                os.remove(leftover)
+            except FileNotFoundError:
+                pass
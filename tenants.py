@@ -0,0 +1,205 @@
+# tenants.py
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional
+from storage import TodoStore, open_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+TENANT_HEADER = "x-todo-tenant"
+TENANT_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Tenant of the current tool call. Set per SSE connection by TenantMiddleware
+# and inherited by the session's tasks and worker threads.
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+def tenant_path(todos_file: str, tenant: str) -> str:
+    """Return the todos file of a tenant
+
+    The default tenant uses todos_file itself, so single-user setups keep their
+    data; every other tenant gets its own shard in a directory next to it
+    (todos.json -> todos.tenants/<tenant>.json).
+    """
+    if tenant == DEFAULT_TENANT:
+        return todos_file
+    stem, ext = os.path.splitext(todos_file)
+    return os.path.join(stem + ".tenants", tenant + (ext or ".json"))
+
+
+class StoreRegistry:
+    """Open todo stores of all tenants, keeping at most max_open of them loaded.
+
+    Stores are opened on first use and closed (flushing their logs) when they
+    are the least recently used one beyond max_open. A store in use is never
+    closed, so the limit can be exceeded briefly while more tenants are active
+    at once. Calls for the same tenant are serialized by a per-tenant lock;
+    different tenants run concurrently.
+    """
+
+    def __init__(self, todos_file: str, max_open: int = 64,
+                 opener: Callable[[str], TodoStore] = open_store):
+        self.todos_file = todos_file
+        self.max_open = max(1, max_open)
+        self.opener = opener
+        self.opened = 0
+        self.evicted = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Last version of closed stores, so a reopened store continues from it
+        # and responses cached by version are never served for stale data
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @contextmanager
+    def acquire(self, tenant: str) -> Iterator[TodoStore]:
+        """Hold the store of a tenant, opening it if needed"""
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is None:
+                entry = self._entries[tenant] = _Entry()
+            self._entries.move_to_end(tenant)
+            entry.pins += 1
+        try:
+            with entry.lock:
+                if entry.store is None:
+                    entry.store = self._open(tenant)
+                yield entry.store
+        finally:
+            with self._lock:
+                entry.pins -= 1
+                self._evict()
+
+    def sizes(self, timeout: float = 0.1) -> Dict[str, int]:
+        """Return the number of todos in each open store, by tenant
+
+        Stores busy for longer than timeout are left out.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+            # Pinned like in acquire(), so they are not closed while counted
+            for _, entry in entries:
+                entry.pins += 1
+        sizes = {}
+        try:
+            for tenant, entry in entries:
+                if not entry.lock.acquire(timeout=timeout):
+                    continue
+                try:
+                    if entry.store is not None:
+                        sizes[tenant] = entry.store.count()
+                finally:
+                    entry.lock.release()
+        finally:
+            with self._lock:
+                for _, entry in entries:
+                    entry.pins -= 1
+                self._evict()
+        return sizes
+
+    def close(self):
+        """Close all open stores"""
+        with self._lock:
+            while self._entries:
+                tenant, entry = self._entries.popitem(last=False)
+                self._close(tenant, entry)
+
+    def _open(self, tenant: str) -> TodoStore:
+        path = tenant_path(self.todos_file, tenant)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        store = self.opener(path)
+        store.version = self._versions.get(tenant, 0) + 1
+        self.opened += 1
+        logger.info(f"Opened todo store of tenant {tenant}: {path}")
+        return store
+
+    def _evict(self):
+        # Closed under _lock, so a tenant is never reopened before its log is flushed
+        excess = len(self._entries) - self.max_open
+        for tenant in list(self._entries):
+            if excess <= 0:
+                break
+            entry = self._entries[tenant]
+            if entry.pins:
+                continue
+            del self._entries[tenant]
+            self._close(tenant, entry)
+            self.evicted += 1
+            excess -= 1
+
+    def _close(self, tenant: str, entry: "_Entry"):
+        if entry.store is None:
+            return
+        self._versions[tenant] = entry.store.version
+        try:
+            entry.store.close()
+        except OSError:
+            logger.exception(f"Failed to close the todo store of tenant {tenant}")
+        entry.store = None
+
+
+class _Entry:
+    __slots__ = ("store", "lock", "pins")
+
+    def __init__(self):
+        self.store: Optional[TodoStore] = None
+        self.lock = threading.RLock()
+        self.pins = 0
+
+
+class TenantMiddleware:
+    """ASGI middleware taking the tenant of a request from the X-Todo-Tenant
+    header (or a ``tenant`` query parameter) and setting current_tenant.
+
+    The tenant of an SSE session is the one of its GET /sse request, as the
+    session's tool calls run in tasks started by that request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = None
+        for name, value in scope["headers"]:
+            if name == TENANT_HEADER.encode():
+                tenant = value.decode("latin-1")
+                break
+        if tenant is None:
+            for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+                name, _, value = pair.partition("=")
+                if name == "tenant":
+                    tenant = value
+                    break
+        if tenant is None:
+            tenant = current_tenant.get()
+        elif not TENANT_RE.match(tenant):
+            await send({
+                "type": "http.response.start",
+                "status": 400,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": b"Invalid tenant: use 1-64 letters, digits, '-' or '_'\n",
+            })
+            return
+
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
@@ -0,0 +1,61 @@
+# tests/test_ids.py
+import ids
+from ids import ALPHABET, LENGTH, IdGenerator
+from todo_tools import full_id, short_id
+
+NOW = 1_750_000_000.0
+
+
+def decode(encoded: str) -> int:
+    value = 0
+    for char in encoded:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+def millis(encoded: str) -> int:
+    return decode(encoded) >> (ids.NODE_BITS + ids.SEQUENCE_BITS)
+
+
+def test_ids_within_one_millisecond_increase():
+    generator = IdGenerator(node=1)
+    made = [generator.new(NOW) for _ in range(1000)]
+    assert made == sorted(made)
+    assert len(set(made)) == len(made)
+    assert all(len(encoded) == LENGTH for encoded in made)
+    assert {millis(encoded) for encoded in made} == {int(NOW * 1000)}
+
+
+def test_ids_increase_when_the_clock_goes_back():
+    generator = IdGenerator(node=1)
+    before = generator.new(NOW)
+    after = [generator.new(NOW - 5), generator.new(NOW - 0.001), generator.new(NOW)]
+    assert [before] + after == sorted([before] + after)
+    assert len(set([before] + after)) == 4
+    # The timestamp holds until the clock catches up, then follows it again
+    assert millis(after[-1]) == int(NOW * 1000)
+    assert millis(generator.new(NOW + 1)) == int((NOW + 1) * 1000)
+
+
+def test_sequence_overflow_borrows_the_next_millisecond():
+    generator = IdGenerator(node=1)
+    made = [generator.new(NOW) for _ in range((1 << ids.SEQUENCE_BITS) + 2)]
+    assert made == sorted(made)
+    assert len(set(made)) == len(made)
+    assert millis(made[-1]) == int(NOW * 1000) + 1
+    # The clock reaching that millisecond does not repeat an ID
+    assert generator.new(NOW + 0.001) > made[-1]
+
+
+def test_ids_sort_by_time_across_generators():
+    first, second = IdGenerator(node=(1 << ids.NODE_BITS) - 1), IdGenerator(node=0)
+    assert first.new(NOW) < second.new(NOW + 0.001)
+    assert first.new(NOW) != second.new(NOW)
+
+
+def test_short_ids_are_accepted_in_either_case():
+    todo_id = "todo_" + IdGenerator(node=1).new(NOW)
+    assert full_id(todo_id) == todo_id
+    assert full_id(short_id(todo_id)) == todo_id
+    assert full_id(short_id(todo_id).lower()) == todo_id
+    assert full_id("TODO_" + short_id(todo_id).lower()) == todo_id
@@ -0,0 +1,84 @@
+# tests/test_openai_client.py
+import asyncio
+import socket
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import todo_tools
+from tenants import DEFAULT_TENANT
+from fake_openai import SCRIPTED_CALLS, create_app, serve_in_thread
+from openai_client import TodoMCPClient
+
+ANSWER_WORDS = 5
+
+
+@pytest.fixture(scope="module")
+def openai_url():
+    """Base URL of the fake OpenAI server, which scripts the model's tool calls and answer"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = serve_in_thread(create_app(token_delay=0.001, answer_words=ANSWER_WORDS), port)
+    yield f"http://127.0.0.1:{port}/v1"
+    server.should_exit = True
+
+
+@pytest.fixture
+def mcp_server(tmp_path):
+    mcp = FastMCP("todo-test")
+    todo_tools.setup(mcp, str(tmp_path / "todos.json"))
+    todo_tools.response_cache.clear()
+    with todo_tools.registry.acquire(DEFAULT_TENANT) as store:
+        store.add({
+            "id": "todo_0001",
+            "title": "Water the plants",
+            "description": "",
+            "priority": "high",
+            "completed": False,
+            "created_at": "2025-01-01T09:00:00",
+            "updated_at": "2025-01-01T09:00:00",
+        })
+    yield mcp
+    todo_tools.registry.close()
+
+
+async def ask(mcp: FastMCP, client: TodoMCPClient, query: str):
+    """Run a query through the client, returning the answer and the (tool, result) pairs it ran"""
+    calls = []
+    execute_tool = client.execute_tool
+
+    async def recording_execute_tool(session, tool_name, arguments):
+        result = await execute_tool(session, tool_name, arguments)
+        calls.append((tool_name, arguments, result))
+        return result
+
+    client.execute_tool = recording_execute_tool
+    async with create_connected_server_and_client_session(
+        mcp._mcp_server, message_handler=client.handle_message
+    ) as session:
+        answer = await client.process_user_query(session, query)
+    return answer, calls
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_tool_calls_then_answer(monkeypatch, openai_url, mcp_server, stream):
+    monkeypatch.setenv("OPENAI_API_KEY", "fake")
+    texts = []
+    client = TodoMCPClient(stream=stream, on_text=texts.append, base_url=openai_url)
+
+    answer, calls = asyncio.run(ask(mcp_server, client, "What is on my plate?"))
+
+    words = " ".join(f"word{i}" for i in range(ANSWER_WORDS))
+    assert answer == f"Here is what I found: {words}."
+    # The scripted calls ran, with their arguments reassembled from the streamed fragments
+    assert sorted((name, arguments) for name, arguments, _ in calls) == sorted(SCRIPTED_CALLS)
+    results = {name: result for name, _, result in calls}
+    assert "Water the plants" in results["list_todos"]
+    assert "Total todos: 1" in results["get_todo_stats"]
+    if stream:
+        # The answer reached on_text token by token
+        assert len(texts) > 1 and "".join(texts) == answer
+    else:
+        assert texts == []
@@ -0,0 +1,115 @@
+# tests/test_pagination.py
+import json
+
+import pytest
+
+import todo_tools
+from storage import JsonStore, SQLiteStore
+
+
+def make_todo(number: int, priority: str = "medium", completed: bool = False):
+    created = f"2025-01-01T00:{number // 60:02d}:{number % 60:02d}"
+    return {
+        "id": f"todo_{number:04d}",
+        "title": f"Task {number}",
+        "description": "",
+        "priority": priority,
+        "completed": completed,
+        "created_at": created,
+        "updated_at": created,
+    }
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "json":
+        store = JsonStore(str(tmp_path / "todos.json"))
+    else:
+        store = SQLiteStore(str(tmp_path / "todos.db"))
+    priorities = ("high", "medium", "low")
+    with store.batch():
+        for number in range(40):
+            store.add(make_todo(number, priorities[number % 3], completed=number % 4 == 0))
+    # Responses are cached by store version, which starts over with each store
+    todo_tools.response_cache.clear()
+    token = todo_tools.current_store.set(store)
+    yield store
+    todo_tools.current_store.reset(token)
+    store.close()
+
+
+def list_page(cursor=None, **arguments):
+    response = json.loads(todo_tools.list_todos(cursor=cursor, response_format="json", **arguments))
+    return [todo["id"] for todo in response["todos"]], response
+
+
+def all_pages(limit: int, filter_by: str = "all", cursor=None, between_pages=None):
+    """Page through list_todos from cursor (the start if None), calling between_pages(page number) after each page"""
+    ids, pages = [], 0
+    while True:
+        page, response = list_page(cursor, limit=limit, filter_by=filter_by)
+        ids += page
+        cursor = response["next_cursor"]
+        pages += 1
+        if cursor is None:
+            return ids
+        assert len(page) == limit
+        if between_pages:
+            between_pages(pages)
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 40, 100])
+@pytest.mark.parametrize("filter_by", ["all", "pending", "completed"])
+def test_pages_add_up_to_the_listing(store, limit, filter_by):
+    expected = [todo["id"] for todo in store.list(filter_by)]
+    assert all_pages(limit, filter_by) == expected
+
+
+def test_page_offsets_count_from_the_start(store):
+    _, first = list_page(limit=5)
+    _, second = list_page(first["next_cursor"], limit=5)
+    assert (first["offset"], second["offset"]) == (0, 5)
+    assert first["total"] == second["total"] == 40
+
+
+def test_deletes_between_pages_neither_repeat_nor_skip(store):
+    expected = [todo["id"] for todo in store.list()]
+    deleted = []
+
+    def delete_some(pages):
+        # One todo already shown and one still to come
+        for todo_id in (expected[pages * 4 - 2], expected[-pages]):
+            if store.delete(todo_id):
+                deleted.append(todo_id)
+
+    ids = all_pages(4, between_pages=delete_some)
+    assert deleted
+    assert len(ids) == len(set(ids))
+    # Every todo still there is shown once, in order
+    assert [todo_id for todo_id in ids if todo_id not in deleted] == \
+        [todo_id for todo_id in expected if todo_id not in deleted]
+
+
+def test_todos_added_between_pages(store):
+    expected = [todo["id"] for todo in store.list()]
+    page, response = list_page(limit=10)
+    # Sorts before the cursor (high priority, created first) and after it (low priority)
+    store.add(dict(make_todo(100, "high"), created_at="2024-12-31T00:00:00"))
+    store.add(dict(make_todo(101, "low"), created_at="2025-02-01T00:00:00"))
+    ids = page + all_pages(10, cursor=response["next_cursor"])
+    assert len(ids) == len(set(ids))
+    assert "todo_0100" not in ids
+    assert ids == expected + ["todo_0101"]
+
+
+def test_completing_between_pages_of_pending(store):
+    expected = [todo["id"] for todo in store.list("pending")]
+    page, response = list_page(limit=5, filter_by="pending")
+    store.update(expected[7], {"completed": True})
+    rest = all_pages(5, "pending", cursor=response["next_cursor"])
+    assert page + rest == [todo_id for todo_id in expected if todo_id != expected[7]]
+
+
+def test_invalid_cursor(store):
+    response = json.loads(todo_tools.list_todos(cursor="not-a-cursor", response_format="json"))
+    assert response["error"] == "invalid_cursor"
@@ -0,0 +1,132 @@
+# tests/test_snapshot.py
+import json
+
+import pytest
+
+import snapshot
+from records import TodoRecord
+from snapshot import BinarySnapshot, is_binary_snapshot, write_snapshot
+from storage import JsonStore, listing_key
+
+
+def make_todos():
+    todos = []
+    for number, priority in enumerate(["high", "medium", "low", "urgent", "someday", "medium"]):
+        created = f"2025-01-0{number + 1}T09:30:00.{number + 1:06d}"
+        todos.append({
+            "id": f"todo_{number:04d}",
+            "title": f"Task {number} ünïcode",
+            "description": "Details" if number % 2 else "",
+            "priority": priority,
+            "completed": number % 3 == 0,
+            "created_at": created,
+            "updated_at": created if number < 3 else "2025-02-01T10:00:00",
+        })
+    todos[1]["due_at"] = "2025-03-01T23:59:59"
+    todos[2]["remind_at"] = "2025-02-15T08:00:00"
+    # JSON can carry lone surrogates, which strict UTF-8 cannot encode
+    todos[5]["title"] = "Broken \ud800 surrogate"
+    return sorted(todos, key=listing_key)
+
+
+def write_v1_snapshot(path: str, records):
+    """Write records in the version 1 layout: no times section"""
+    ids = "\0".join(record.id for record in records).encode("utf-8", snapshot.TEXT_ERRORS)
+    offset = (snapshot.HEADER.size + snapshot.INDEX_ENTRY.size * len(records)
+              + snapshot.IDS_LENGTH.size + len(ids))
+    index, payloads = [], []
+    for record in records:
+        if isinstance(record.priority, int):
+            code, custom = record.priority, b""
+        else:
+            code, custom = snapshot.CUSTOM_PRIORITY, record.priority.encode()
+        title = record.title.encode("utf-8", snapshot.TEXT_ERRORS)
+        description = record.description.encode()
+        payload = (snapshot.RECORD_HEAD.pack(record.updated_at, len(title), len(description), len(custom))
+                   + title + description + custom)
+        index.append(snapshot.INDEX_ENTRY.pack(offset, record.completed, code, record.created_at))
+        payloads.append(snapshot.RECORD_LENGTH.pack(len(payload)) + payload)
+        offset += len(payloads[-1])
+    with open(path, "wb") as f:
+        f.write(snapshot.HEADER.pack(snapshot.MAGIC, 1, 0, len(records)))
+        f.write(b"".join(index) + snapshot.IDS_LENGTH.pack(len(ids)) + ids + b"".join(payloads))
+
+
+def test_binary_snapshot_round_trip(tmp_path):
+    todos = make_todos()
+    path = str(tmp_path / "todos.json")
+    with open(path, "wb") as f:
+        write_snapshot(f, [TodoRecord.from_dict(todo) for todo in todos])
+    assert is_binary_snapshot(path)
+
+    binary = BinarySnapshot(path)
+    try:
+        assert len(binary) == len(todos)
+        assert binary.ids() == [todo["id"] for todo in todos]
+        for position, todo in enumerate(todos):
+            assert binary.record(position, todo["id"]).to_dict() == todo
+    finally:
+        binary.close()
+
+
+def test_version_1_snapshot_is_read(tmp_path):
+    todos = [todo for todo in make_todos() if "due_at" not in todo and "remind_at" not in todo]
+    path = str(tmp_path / "todos.json")
+    write_v1_snapshot(path, [TodoRecord.from_dict(todo) for todo in todos])
+
+    store = JsonStore(path)
+    try:
+        assert store.list() == todos
+        assert store.get("todo_0003")["priority"] == "urgent"
+        assert store.stats()["completed"] == sum(todo["completed"] for todo in todos)
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("changes_after_load", [False, True])
+def test_store_round_trip_through_binary_snapshot(tmp_path, changes_after_load):
+    todos = make_todos()
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path, snapshot_format="binary")
+    with store.batch():
+        for todo in todos:
+            store.add(todo)
+    store.log.compact()
+    store.close()
+    assert is_binary_snapshot(path)
+
+    store = JsonStore(path, snapshot_format="binary")
+    if changes_after_load:
+        # Before the first listing, so changed todos are not in the ordering lists yet
+        store.update("todo_0004", {"completed": True, "priority": "low"})
+        store.delete("todo_0000")
+        changed = {todo["id"]: todo for todo in todos}
+        changed["todo_0004"].update(completed=True, priority="low")
+        del changed["todo_0000"]
+        todos = sorted(changed.values(), key=listing_key)
+    try:
+        assert store.list() == todos
+        assert store.list("completed") == [todo for todo in todos if todo["completed"]]
+        assert store.get("todo_0003")["priority"] == "urgent"
+        assert store.due() == [todo for todo in todos if "due_at" in todo]
+        assert store.due(field="remind_at") == [todo for todo in todos if "remind_at" in todo]
+        assert store.search("surrogate")[0]["title"] == "Broken \ud800 surrogate"
+    finally:
+        store.close()
+
+
+def test_convert_json_store_in_place(tmp_path):
+    todos = make_todos()
+    path = str(tmp_path / "todos.json")
+    with open(path, "w") as f:
+        json.dump({todo["id"]: todo for todo in todos[:-1]}, f)
+    with open(path + ".log", "w") as f:
+        f.write(json.dumps({"op": "put", "todo": todos[-1]}) + "\n")
+
+    assert snapshot.convert(path, path) == len(todos)
+    assert is_binary_snapshot(path)
+    store = JsonStore(path)
+    try:
+        assert store.list() == todos
+    finally:
+        store.close()
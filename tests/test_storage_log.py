@@ -0,0 +1,127 @@
+# tests/test_storage_log.py
+import json
+import os
+
+from storage import JsonStore
+
+
+def make_todo(number: int, **fields):
+    todo = {
+        "id": f"todo_{number:04d}",
+        "title": f"Task {number}",
+        "description": "",
+        "priority": "medium",
+        "completed": False,
+        "created_at": f"2025-01-01T00:00:{number % 60:02d}",
+        "updated_at": f"2025-01-01T00:00:{number % 60:02d}",
+    }
+    todo.update(fields)
+    return todo
+
+
+def reopen(store: JsonStore, path: str) -> JsonStore:
+    store.close()
+    return JsonStore(path)
+
+
+def test_replay_restores_changes(tmp_path):
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path)
+    for number in range(5):
+        store.add(make_todo(number))
+    store.update("todo_0001", {"title": "Renamed", "completed": True})
+    store.delete("todo_0002")
+    expected = store.list()
+
+    store = reopen(store, path)
+    assert not os.path.exists(path), "the changes are only in the log"
+    assert store.list() == expected
+    assert store.get("todo_0001")["title"] == "Renamed"
+    assert store.get("todo_0002") is None
+    store.close()
+
+
+def test_replay_applies_batches_whole(tmp_path):
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path)
+    with store.batch():
+        for number in range(3):
+            store.add(make_todo(number))
+    store = reopen(store, path)
+    with open(path + ".log") as f:
+        assert [json.loads(line)["op"] for line in f] == ["batch"]
+    assert store.count() == 3
+    store.close()
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path)
+    store.add(make_todo(1))
+    store.add(make_todo(2))
+    store.close()
+    # An append interrupted halfway, without its newline
+    line = json.dumps({"op": "put", "todo": make_todo(3)})
+    with open(path + ".log", "a") as f:
+        f.write(line[:len(line) // 2])
+
+    store = JsonStore(path)
+    assert [todo["id"] for todo in store.list()] == ["todo_0001", "todo_0002"]
+    with open(path + ".log", "rb") as f:
+        assert f.read().endswith(b"\n"), "the torn tail is cut off"
+
+    # The next append starts on a line of its own, so it survives a reload
+    store.add(make_todo(4))
+    store = reopen(store, path)
+    assert [todo["id"] for todo in store.list()] == ["todo_0001", "todo_0002", "todo_0004"]
+    store.close()
+
+
+def test_complete_last_line_without_newline_is_dropped(tmp_path):
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path)
+    store.add(make_todo(1))
+    store.close()
+    # Valid JSON, but the newline that ends every append is missing
+    with open(path + ".log", "a") as f:
+        f.write(json.dumps({"op": "put", "todo": make_todo(2)}))
+
+    store = JsonStore(path)
+    assert store.count() == 1
+    store.close()
+
+
+def test_compaction_moves_log_into_snapshot(tmp_path):
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path)
+    for number in range(10):
+        store.add(make_todo(number, completed=number % 3 == 0))
+    store.delete("todo_0005")
+    expected = store.list()
+
+    store.log.compact()
+    assert os.path.getsize(path + ".log") == 0
+    with open(path) as f:
+        assert sorted(json.load(f)) == sorted(todo["id"] for todo in expected)
+
+    # Changes after the compaction go to the log again, on top of the snapshot
+    store.update("todo_0001", {"title": "After compaction"})
+    store = reopen(store, path)
+    assert store.get("todo_0001")["title"] == "After compaction"
+    assert [todo["id"] for todo in store.list()] == [todo["id"] for todo in expected]
+    store.close()
+
+
+def test_log_compacts_itself(tmp_path):
+    path = str(tmp_path / "todos.json")
+    store = JsonStore(path)
+    store.log.compact_min = 4
+    for number in range(4):
+        store.add(make_todo(number))
+    store.log.flush()
+    assert os.path.exists(path)
+    assert os.path.getsize(path + ".log") == 0
+
+    store = reopen(store, path)
+    assert store.count() == 4
+    store.close()
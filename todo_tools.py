@@ -0,0 +1,912 @@
+# todo_tools.py
+import atexit
+import base64
+import binascii
+import functools
+import json
+import logging
+import os
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import anyio
+from mcp.server.fastmcp import FastMCP
+from cache import LRUCache
+from ids import new_id
+from metrics import Counter, Gauge, Histogram
+from profiling import phase, profiler
+from storage import TodoStore, listing_key
+from tenants import StoreRegistry, current_tenant
+
+logger = logging.getLogger(__name__)
+
+# Todo stores of all tenants, created by setup()
+registry: StoreRegistry = None
+
+# Store of the tenant whose tool call is running, set by offloaded()
+current_store: ContextVar[TodoStore] = ContextVar("current_store")
+
+# Whether listings repeat each todo's ID as a hint for completing it
+completion_hints = True
+
+# Listing view of list_todos and search_todos called without one, 'full' or 'compact' (TODOS_LIST_VIEW)
+default_list_view = os.environ.get("TODOS_LIST_VIEW", "full").lower()
+
+# Response format of tools called without one, 'text' or 'json' (TODOS_RESPONSE_FORMAT)
+default_response_format = os.environ.get("TODOS_RESPONSE_FORMAT", "text").lower()
+
+# Rendered responses of read-only tools, keyed by tool, tenant, arguments and store version
+response_cache = LRUCache(int(os.environ.get("TODOS_CACHE_SIZE", 256)))
+
+TOOL_CALLS = Counter("todo_tool_calls_total", "Tool calls", ["tool"])
+TOOL_ERRORS = Counter("todo_tool_errors_total", "Tool calls that raised an error", ["tool"])
+TOOL_SECONDS = Histogram("todo_tool_duration_seconds", "Tool call latency, including waiting for the store", ["tool"])
+Counter("todo_response_cache_hits_total", "Read responses served from response_cache",
+        collect=lambda: {(): response_cache.hits})
+Counter("todo_response_cache_misses_total", "Read responses rendered because they were not cached",
+        collect=lambda: {(): response_cache.misses})
+Gauge("todo_open_stores", "Tenant stores loaded in memory", collect=lambda: {(): len(registry) if registry else 0})
+Counter("todo_store_opens_total", "Tenant stores opened (loaded from disk)",
+        collect=lambda: {(): registry.opened if registry else 0})
+Counter("todo_store_evictions_total", "Tenant stores closed to stay within TODOS_MAX_OPEN_STORES",
+        collect=lambda: {(): registry.evicted if registry else 0})
+# Summed over tenants: /metrics is public, and a label per tenant would
+# expose tenant names and grow with their number
+Gauge("todo_store_todos", "Todos in the loaded tenant stores",
+      collect=lambda: {(): sum(registry.sizes().values()) if registry else 0})
+
+def cached(tool):
+    """Serve repeated calls of a read-only tool from response_cache until the store changes"""
+    @functools.wraps(tool)
+    def wrapper(*args, **kwargs):
+        key = (tool.__name__, current_tenant.get(), args, tuple(sorted(kwargs.items())), current_store.get().version)
+        response = response_cache.get(key)
+        if response is None:
+            response = tool(*args, **kwargs)
+            response_cache.put(key, response)
+        return response
+    return wrapper
+
+def offloaded(tool):
+    """Run a tool in a worker thread on the current tenant's store, so it never blocks the event loop"""
+    def locked(*args, **kwargs):
+        with registry.acquire(current_tenant.get()) as store:
+            token = current_store.set(store)
+            try:
+                return profiler.call(tool.__name__, functools.partial(tool, *args, **kwargs))
+            finally:
+                current_store.reset(token)
+
+    @functools.wraps(tool)
+    async def wrapper(*args, **kwargs):
+        name = tool.__name__
+        TOOL_CALLS.inc(tool=name)
+        try:
+            with TOOL_SECONDS.time(tool=name):
+                return await anyio.to_thread.run_sync(functools.partial(locked, *args, **kwargs))
+        except Exception:
+            TOOL_ERRORS.inc(tool=name)
+            raise
+    return wrapper
+
+# Page size of list_todos when no limit is given, and the largest allowed
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Prefix of todo IDs, left out of compact listings and optional in tool arguments
+ID_PREFIX = "todo_"
+
+def encode_cursor(key: Tuple, number: int) -> str:
+    """Encode a listing position (sort key of the last todo shown and its number)"""
+    data = json.dumps([*key, number], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Tuple, int]:
+    """Decode a cursor made by encode_cursor, raising ValueError if it is malformed"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        rank, created_at, todo_id, number = json.loads(data)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(rank, int) or not isinstance(number, int) or not isinstance(created_at, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    try:
+        datetime.fromisoformat(created_at)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return (rank, str(created_at), str(todo_id)), number
+
+def wants_json(response_format: str) -> bool:
+    """Whether a tool answers in JSON, given its response_format argument"""
+    return (response_format or default_response_format).lower() == "json"
+
+def json_response(payload: Dict) -> str:
+    """Encode a JSON response compactly"""
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+def error_response(as_json: bool, code: str, message: str, **details) -> str:
+    """Return an error message, or in JSON mode an object with a stable error code"""
+    if as_json:
+        return json_response({"error": code, "message": message, **details})
+    return message
+
+def not_found(as_json: bool, todo_id: str) -> str:
+    return error_response(as_json, "not_found", f"Todo with ID '{todo_id}' not found", todo_id=todo_id)
+
+def parse_time(value: str, end_of_day: bool = False) -> str:
+    """Convert a due or reminder time to the naive local ISO form todos store
+
+    A date alone means the start of that day, or its last second with
+    end_of_day. Times with a UTC offset are converted to local time. Raises
+    ValueError for anything else.
+    """
+    value = value.strip()
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r}. Use an ISO date or time like 2025-06-30 or 2025-06-30T17:00")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    if end_of_day and len(value) <= 10:
+        moment = moment.replace(hour=23, minute=59, second=59)
+    return moment.isoformat()
+
+def format_time(value: str) -> str:
+    """Show a stored time to the minute"""
+    return value[:16].replace("T", " ")
+
+def create_todo(title: str, description: str = "", priority: str = "medium",
+                due_at: str = "", remind_at: str = "", response_format: str = "") -> str:
+    """Create a new todo item
+
+    Args:
+        title: The title of the todo
+        description: Optional description of the todo
+        priority: Priority level (low, medium, high)
+        due_at: Optional ISO date or time the todo is due; a date means the end of that day
+        remind_at: Optional ISO date or time to be reminded of the todo
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message with the created todo ID
+    """
+    store = current_store.get()
+    try:
+        times = {"due_at": parse_time(due_at, end_of_day=True) if due_at else None,
+                 "remind_at": parse_time(remind_at) if remind_at else None}
+    except ValueError as e:
+        return error_response(wants_json(response_format), "invalid_time", str(e))
+    # The ID and creation time come from the same clock reading, so IDs sort like created_at
+    now = time.time()
+    todo_id = ID_PREFIX + new_id(now)
+    created_at = datetime.fromtimestamp(now).isoformat()
+
+    todo = {
+        "id": todo_id,
+        "title": title,
+        "description": description,
+        "priority": priority,
+        "completed": False,
+        "created_at": created_at,
+        "updated_at": created_at
+    }
+    # Like the stores, leave out unset times
+    todo.update((field, value) for field, value in times.items() if value)
+    with phase("persist"):
+        store.add(todo)
+
+    logger.info(f"Created todo: {todo_id} - {title}")
+    if wants_json(response_format):
+        return json_response({"todo": todo})
+    if "due_at" in todo:
+        return f"Created todo '{title}' with ID: {todo_id}, due {format_time(todo['due_at'])}"
+    return f"Created todo '{title}' with ID: {todo_id}"
+
+# Fields a compact listing can show, and the ones it shows by default
+LIST_FIELDS = ("status", "priority", "title", "description", "id", "created", "due")
+COMPACT_FIELDS = ("status", "priority", "title", "id", "due")
+# Key of each listing field in a todo, for JSON listings
+FIELD_KEYS = {"status": "completed", "priority": "priority", "title": "title", "description": "description",
+              "id": "id", "created": "created_at", "due": "due_at"}
+
+def short_id(todo_id: str) -> str:
+    return todo_id[len(ID_PREFIX):] if todo_id.startswith(ID_PREFIX) else todo_id
+
+def full_id(todo_id: str) -> str:
+    """Accept a todo ID with or without its prefix, in either case (IDs are read like Crockford base32)"""
+    if todo_id[:len(ID_PREFIX)].lower() == ID_PREFIX:
+        todo_id = todo_id[len(ID_PREFIX):]
+    return ID_PREFIX + todo_id.upper()
+
+def listing_fields(view: str, fields: str) -> Optional[Tuple[str, ...]]:
+    """Return the fields of a compact listing, or None for the full one
+
+    Raises ValueError for unknown views or fields.
+    """
+    if fields:
+        selected = tuple(field.strip().lower() for field in fields.split(",") if field.strip())
+        unknown = [field for field in selected if field not in LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Choose from {', '.join(LIST_FIELDS)}")
+        return selected
+    view = (view or default_list_view).lower()
+    if view == "full":
+        return None
+    if view == "compact":
+        return COMPACT_FIELDS
+    raise ValueError(f"Unknown view: {view}. Use 'full' or 'compact'")
+
+def project_todos(todos: List[Dict], fields: Optional[Tuple[str, ...]]) -> List[Dict]:
+    """Keep only the keys of the listing fields in todos for a JSON listing (all of them for the full view)"""
+    if fields is None:
+        return todos
+    keys = [FIELD_KEYS[field] for field in fields]
+    return [{key: todo[key] for key in keys if key in todo} for todo in todos]
+
+def format_compact(parts: List[str], number: int, todo: Dict, fields: Tuple[str, ...]):
+    """Append the one-line listing entry of a todo to parts, showing only fields"""
+    line = [f"{number}."]
+    if "status" in fields:
+        line.append("✓" if todo["completed"] else "○")
+    if "priority" in fields:
+        line.append(todo["priority"][:1].upper())
+    if "title" in fields:
+        line.append(todo["title"])
+    if "description" in fields and todo["description"]:
+        line.append("- " + " ".join(todo["description"].split()))
+    extra = []
+    if "id" in fields:
+        extra.append(short_id(todo["id"]))
+    if "created" in fields:
+        extra.append(todo["created_at"][:10])
+    if "due" in fields and todo.get("due_at"):
+        extra.append("due " + format_time(todo["due_at"]))
+    if extra:
+        line.append(f"[{' '.join(extra)}]")
+    parts.append(" ".join(line) + "\n")
+
+def format_todo(parts: List[str], number: int, todo: Dict):
+    """Append the listing entry of a todo to parts"""
+    status = "✓" if todo["completed"] else "○"
+    parts.append(f"{number}. {status} [{todo['priority'].upper()}] {todo['title']}\n")
+    if todo["description"]:
+        parts.append(f"   Description: {todo['description']}\n")
+    parts.append(f"   ID: {todo['id']}\n")
+    parts.append(f"   Created: {todo['created_at'][:10]}\n")
+    if todo.get("due_at"):
+        parts.append(f"   Due: {format_time(todo['due_at'])}\n")
+    if todo.get("remind_at"):
+        parts.append(f"   Reminder: {format_time(todo['remind_at'])}\n")
+    if completion_hints:
+        parts.append(f"   To complete this task, use ID: {todo['id']}\n")
+    parts.append("\n")
+
+@cached
+def list_todos(filter_by: str = "all", limit: int = DEFAULT_PAGE_SIZE,
+               cursor: Optional[str] = None, offset: int = 0, view: str = "", fields: str = "",
+               response_format: str = "") -> str:
+    """List all todos with optional filtering
+
+    Results are paged; when more todos are available the response ends with
+    a cursor to pass back in to get the next page. The compact view shows one
+    line per todo: status, priority initial, title and [ID], where the ID
+    can be passed to the other tools as is.
+
+    Args:
+        filter_by: Filter todos by status - 'all', 'completed', 'pending'
+        limit: Maximum number of todos to return (default 50)
+        cursor: Cursor from a previous list_todos response to continue from
+        offset: Number of todos to skip (after the cursor, if given)
+        view: 'full' or 'compact' (defaults to the server setting)
+        fields: Comma-separated fields of a compact listing, e.g. 'id,title' (any of status, priority, title, description, id, created, due)
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        JSON formatted list of todos
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    after, number = None, 0
+    if cursor:
+        try:
+            after, number = decode_cursor(cursor)
+        except ValueError:
+            return error_response(as_json, "invalid_cursor", f"Invalid cursor: {cursor}")
+    try:
+        compact = listing_fields(view, fields)
+    except ValueError as e:
+        return error_response(as_json, "invalid_fields", str(e))
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    number += offset
+
+    # Sorted by priority (high -> medium -> low) and creation date
+    with phase("lookup"):
+        # One extra todo tells whether there is a next page; the position kept in
+        # the cursor overcounts once todos before it are deleted
+        page = store.list(filter_by, after=after, limit=limit + 1, offset=offset)
+        total = store.count(filter_by)
+    more = len(page) > limit
+    page = page[:limit]
+    number = max(0, min(number, total - len(page) - more))
+    last = number + len(page)
+    next_cursor = encode_cursor(listing_key(page[-1]), last) if more else None
+
+    if as_json:
+        with phase("format"):
+            return json_response({"total": total, "offset": number, "todos": project_todos(page, compact),
+                                  "next_cursor": next_cursor})
+
+    if not page:
+        return f"No todos found with filter: {filter_by}"
+
+    # Format the response with clear numbering and IDs
+    with phase("format"):
+        if number == 0 and not more:
+            parts = [f"Found {total} todo(s):\n\n"]
+        else:
+            parts = [f"Found {total} todo(s), showing {number + 1}-{last}:\n\n"]
+        for i, todo in enumerate(page, number + 1):
+            if compact:
+                format_compact(parts, i, todo, compact)
+            else:
+                format_todo(parts, i, todo)
+
+        if next_cursor:
+            parts.append(f"More todos available. To see the next page, call list_todos with cursor: {next_cursor}\n")
+
+        return "".join(parts)
+
+@cached
+def search_todos(query: str, limit: int = 10, filter_by: str = "all", view: str = "", fields: str = "",
+                 response_format: str = "") -> str:
+    """Find todos by words in their title or description
+
+    Words also match longer words they start with ("groc" finds "groceries").
+
+    Args:
+        query: Words to search for
+        limit: Maximum number of todos to return (default 10)
+        filter_by: Filter todos by status - 'all', 'completed', 'pending'
+        view: 'full' or 'compact' (defaults to the server setting)
+        fields: Comma-separated fields of a compact listing, e.g. 'id,title' (any of status, priority, title, description, id, created, due)
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Matching todos, best match first
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    try:
+        compact = listing_fields(view, fields)
+    except ValueError as e:
+        return error_response(as_json, "invalid_fields", str(e))
+    with phase("lookup"):
+        matches = store.search(query, max(1, min(limit, MAX_PAGE_SIZE)), filter_by)
+
+    if as_json:
+        with phase("format"):
+            return json_response({"todos": project_todos(matches, compact)})
+
+    if not matches:
+        return f"No todos found matching: {query}"
+
+    with phase("format"):
+        parts = [f"Found {len(matches)} matching todo(s):\n\n"]
+        for i, todo in enumerate(matches, 1):
+            if compact:
+                format_compact(parts, i, todo, compact)
+            else:
+                format_todo(parts, i, todo)
+
+        return "".join(parts)
+
+@cached
+def get_todo(todo_id: str, response_format: str = "") -> str:
+    """Get details of a specific todo
+
+    Args:
+        todo_id: The ID of the todo to retrieve
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        JSON formatted todo details
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    with phase("lookup"):
+        todo = store.get(full_id(todo_id))
+    if todo is None:
+        logger.error(f"Todo not found: {todo_id}")
+
+        return not_found(as_json, todo_id)
+
+    if as_json:
+        return json_response({"todo": todo})
+
+    status = "Completed" if todo["completed"] else "Pending"
+
+    response = f"Todo Details:\n"
+    response += f"Title: {todo['title']}\n"
+    response += f"Description: {todo['description'] or 'No description'}\n"
+    response += f"Priority: {todo['priority']}\n"
+    response += f"Status: {status}\n"
+    response += f"Created: {todo['created_at']}\n"
+    response += f"Updated: {todo['updated_at']}\n"
+    if todo.get("due_at"):
+        response += f"Due: {todo['due_at']}\n"
+    if todo.get("remind_at"):
+        response += f"Reminder: {todo['remind_at']}\n"
+
+    return response
+
+def update_todo(todo_id: str, title: Optional[str] = None,
+                description: Optional[str] = None,
+                priority: Optional[str] = None, due_at: Optional[str] = None,
+                remind_at: Optional[str] = None, response_format: str = "") -> str:
+    """Update an existing todo
+
+    Args:
+        todo_id: The ID of the todo to update
+        title: New title (optional)
+        description: New description (optional)
+        priority: New priority (optional)
+        due_at: New ISO due date or time (optional); a date means the end of that day, '' removes it
+        remind_at: New ISO reminder time (optional); '' removes it
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    changes = {"updated_at": datetime.now().isoformat()}
+    if title is not None:
+        changes["title"] = title
+    if description is not None:
+        changes["description"] = description
+    if priority is not None:
+        changes["priority"] = priority
+    try:
+        if due_at is not None:
+            changes["due_at"] = parse_time(due_at, end_of_day=True) if due_at else None
+        if remind_at is not None:
+            changes["remind_at"] = parse_time(remind_at) if remind_at else None
+    except ValueError as e:
+        return error_response(as_json, "invalid_time", str(e))
+
+    with phase("persist"):
+        todo = store.update(full_id(todo_id), changes)
+    if todo is None:
+        logger.error(f"Todo not found: {todo_id}")
+
+        return not_found(as_json, todo_id)
+
+    if as_json:
+        return json_response({"todo": todo})
+    return f"Updated todo '{todo['title']}' (ID: {todo['id']})"
+
+def complete_todo(todo_id: str, response_format: str = "") -> str:
+    """Mark a todo as completed
+
+    Args:
+        todo_id: The ID of the todo to complete
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    with phase("lookup"):
+        todo = store.get(full_id(todo_id))
+    if todo is None:
+        logger.error(f"Todo not found: {todo_id}")
+
+        return not_found(as_json, todo_id)
+
+    if todo["completed"]:
+        if as_json:
+            return json_response({"todo": todo, "changed": False})
+        return f"Todo '{todo['title']}' is already completed"
+
+    with phase("persist"):
+        todo = store.update(todo["id"], {"completed": True, "updated_at": datetime.now().isoformat()})
+
+    logger.info(f"Completed todo: {todo['id']} - {todo['title']}")
+    if as_json:
+        return json_response({"todo": todo, "changed": True})
+    return f"Completed todo '{todo['title']}' (ID: {todo['id']})"
+
+def uncomplete_todo(todo_id: str, response_format: str = "") -> str:
+    """Mark a completed todo as pending
+
+    Args:
+        todo_id: The ID of the todo to mark as pending
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    with phase("lookup"):
+        todo = store.get(full_id(todo_id))
+    if todo is None:
+        logger.error(f"Todo not found: {todo_id}")
+
+        return not_found(as_json, todo_id)
+
+    if not todo["completed"]:
+        if as_json:
+            return json_response({"todo": todo, "changed": False})
+        return f"Todo '{todo['title']}' is already pending"
+
+    with phase("persist"):
+        todo = store.update(todo["id"], {"completed": False, "updated_at": datetime.now().isoformat()})
+
+    if as_json:
+        return json_response({"todo": todo, "changed": True})
+    return f"Marked todo '{todo['title']}' as pending (ID: {todo['id']})"
+
+def delete_todo(todo_id: str, response_format: str = "") -> str:
+    """Delete a todo
+
+    Args:
+        todo_id: The ID of the todo to delete
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    with phase("persist"):
+        todo = store.delete(full_id(todo_id))
+    if todo is None:
+        return not_found(as_json, todo_id)
+
+    if as_json:
+        return json_response({"todo": todo})
+    return f"Deleted todo '{todo['title']}' (ID: {todo['id']})"
+
+def clear_completed_todos(response_format: str = "") -> str:
+    """Delete all completed todos
+
+    Args:
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message with count of deleted todos
+    """
+    store = current_store.get()
+    with phase("persist"):
+        cleared = store.clear_completed()
+
+    if wants_json(response_format):
+        return json_response({"cleared": cleared})
+
+    if not cleared:
+        return "No completed todos to clear"
+
+    return f"Cleared {cleared} completed todo(s)"
+
+@cached
+def get_todo_stats(response_format: str = "") -> str:
+    """Get statistics about todos
+
+    Args:
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Summary of todo statistics
+    """
+    store = current_store.get()
+    with phase("lookup"):
+        counts = store.stats()
+    pending = counts["pending"]
+
+    if wants_json(response_format):
+        return json_response(counts)
+
+    stats = f"Todo Statistics:\n"
+    stats += f"Total todos: {counts['total']}\n"
+    stats += f"Completed: {counts['completed']}\n"
+    stats += f"Pending: {pending}\n\n"
+
+    if pending > 0:
+        stats += f"Pending by priority:\n"
+        stats += f"  High: {counts['high']}\n"
+        stats += f"  Medium: {counts['medium']}\n"
+        stats += f"  Low: {counts['low']}\n"
+
+    return stats
+
+def format_due(parts: List[str], todos: List[Dict], compact: Optional[Tuple[str, ...]]) -> str:
+    """Append the listing entries of due todos to parts, with the fields from listing_fields()"""
+    for i, todo in enumerate(todos, 1):
+        if compact:
+            format_compact(parts, i, todo, compact)
+        else:
+            format_todo(parts, i, todo)
+    return "".join(parts)
+
+# Not cached: what is due depends on the time of the call, not only on the store
+def list_due(before: str = "", limit: int = 20, reminders: bool = False, view: str = "", fields: str = "",
+             response_format: str = "") -> str:
+    """List pending todos due by a given time, earliest first
+
+    Without before, lists the overdue todos. Served from a deadline index, so
+    the cost grows with the number of todos returned, not with the list.
+
+    Args:
+        before: ISO date or time to list todos due at or before (default now); a date means the end of that day
+        limit: Maximum number of todos to return (default 20)
+        reminders: List todos whose reminder time has come instead, by reminder time
+        view: 'full' or 'compact' (defaults to the server setting)
+        fields: Comma-separated fields of a compact listing, e.g. 'id,title' (any of status, priority, title, description, id, created, due)
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        The todos due, earliest first
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    try:
+        until = parse_time(before, end_of_day=True) if before else datetime.now().isoformat()
+    except ValueError as e:
+        return error_response(as_json, "invalid_time", str(e))
+    try:
+        compact = listing_fields(view, fields)
+    except ValueError as e:
+        return error_response(as_json, "invalid_fields", str(e))
+    with phase("lookup"):
+        todos = store.due(until=until, limit=max(1, min(limit, MAX_PAGE_SIZE)),
+                          field="remind_at" if reminders else "due_at")
+
+    if as_json:
+        with phase("format"):
+            return json_response({"todos": project_todos(todos, compact), "before": until})
+
+    what = "with reminders" if reminders else "due"
+    if not todos:
+        return f"No pending todos {what} by {format_time(until)}"
+
+    with phase("format"):
+        return format_due([f"Found {len(todos)} pending todo(s) {what} by {format_time(until)}:\n\n"], todos, compact)
+
+def next_due(n: int = 5, view: str = "", fields: str = "", response_format: str = "") -> str:
+    """List the next pending todos to come due, soonest first
+
+    Args:
+        n: Number of todos to return (default 5)
+        view: 'full' or 'compact' (defaults to the server setting)
+        fields: Comma-separated fields of a compact listing, e.g. 'id,title' (any of status, priority, title, description, id, created, due)
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        The upcoming todos, soonest first
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    try:
+        compact = listing_fields(view, fields)
+    except ValueError as e:
+        return error_response(as_json, "invalid_fields", str(e))
+    with phase("lookup"):
+        todos = store.due(since=datetime.now().isoformat(), limit=max(1, min(n, MAX_PAGE_SIZE)))
+
+    if as_json:
+        with phase("format"):
+            return json_response({"todos": project_todos(todos, compact)})
+
+    if not todos:
+        return "No upcoming due dates"
+
+    with phase("format"):
+        return format_due([f"Next {len(todos)} due todo(s):\n\n"], todos, compact)
+
+def complete_todo_by_number(position: int, response_format: str = "") -> str:
+    """Complete a todo by its position number in the list
+
+    Args:
+        position: The position number of the todo (1 for first, 2 for second, etc.)
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Success message
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    # Pending todos are ordered by priority and creation date
+    with phase("lookup"):
+        todo = store.pending_at(position)
+
+    # Check if position is valid
+    if todo is None:
+        pending = store.stats()["pending"]
+        return error_response(
+            as_json, "invalid_position",
+            f"Invalid position. You have {pending} pending todos. Please use a number between 1 and {pending}.",
+            pending=pending
+        )
+
+    # Mark as completed
+    todo_id = todo["id"]
+    with phase("persist"):
+        todo = store.update(todo_id, {"completed": True, "updated_at": datetime.now().isoformat()})
+
+    if as_json:
+        return json_response({"position": position, "todo": todo})
+    return f"Completed todo #{position}: '{todo['title']}' (ID: {todo_id})"
+
+def format_batch_results(results: List[str], as_json: bool = False) -> str:
+    """Number the per-item messages of a batch tool, or list the per-item JSON responses"""
+    if as_json:
+        return '{"results":[' + ','.join(results) + ']}'
+    lines = [f"Processed {len(results)} todo(s):"]
+    lines.extend(f"{i}. {result}" for i, result in enumerate(results, 1))
+    return "\n".join(lines) + "\n"
+
+def create_todos(todos: List[Dict[str, str]], response_format: str = "") -> str:
+    """Create several todo items at once
+
+    Args:
+        todos: Todos to create, each with a 'title' and optional 'description', 'priority' (low, medium, high), 'due_at' and 'remind_at'
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        One result line per todo, with the created todo IDs
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    results = []
+    with store.batch():
+        for item in todos:
+            if not item.get("title"):
+                results.append(error_response(as_json, "missing_title", "Skipped todo without a title"))
+                continue
+            results.append(create_todo(item["title"], item.get("description", ""), item.get("priority", "medium"),
+                                       item.get("due_at", ""), item.get("remind_at", ""),
+                                       response_format=response_format))
+    return format_batch_results(results, as_json)
+
+def update_todos(updates: List[Dict[str, str]], response_format: str = "") -> str:
+    """Update several todos at once
+
+    Args:
+        updates: Updates to apply, each with a 'todo_id' and any of 'title', 'description', 'priority', 'due_at' and 'remind_at'
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        One result line per update
+    """
+    store = current_store.get()
+    as_json = wants_json(response_format)
+    results = []
+    with store.batch():
+        for item in updates:
+            if not item.get("todo_id"):
+                results.append(error_response(as_json, "missing_todo_id", "Skipped update without a todo_id"))
+                continue
+            results.append(update_todo(item["todo_id"], item.get("title"), item.get("description"), item.get("priority"),
+                                       item.get("due_at"), item.get("remind_at"), response_format=response_format))
+    return format_batch_results(results, as_json)
+
+def complete_todos(todo_ids: List[str], response_format: str = "") -> str:
+    """Mark several todos as completed at once
+
+    Args:
+        todo_ids: The IDs of the todos to complete
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        One result line per todo
+    """
+    store = current_store.get()
+    with store.batch():
+        results = [complete_todo(todo_id, response_format=response_format) for todo_id in todo_ids]
+    return format_batch_results(results, wants_json(response_format))
+
+def delete_todos(todo_ids: List[str], response_format: str = "") -> str:
+    """Delete several todos at once
+
+    Args:
+        todo_ids: The IDs of the todos to delete
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        One result line per todo
+    """
+    store = current_store.get()
+    with store.batch():
+        results = [delete_todo(todo_id, response_format=response_format) for todo_id in todo_ids]
+    return format_batch_results(results, wants_json(response_format))
+
+def start_profiling(seconds: int = 60, mode: str = "phases", response_format: str = "") -> str:
+    """Profile tool calls for a while, to find where time goes
+
+    Args:
+        seconds: Length of the profiling window
+        mode: 'phases' to time tools and their phases (lookup, format, persist),
+            or 'cprofile' to also collect function statistics (runs tool calls one at a time)
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Confirmation message
+    """
+    as_json = wants_json(response_format)
+    try:
+        profiler.start(seconds, mode)
+    except ValueError as e:
+        return error_response(as_json, "invalid_mode", str(e))
+    if as_json:
+        return json_response({"seconds": seconds, "mode": mode})
+    return f"Profiling tool calls for {seconds}s ({mode}). Call get_profile for the results."
+
+def get_profile(stop: bool = False, response_format: str = "") -> str:
+    """Get the results of the current or last profiling window
+
+    Args:
+        stop: End the profiling window now
+        response_format: 'text' or 'json' (defaults to the server setting)
+
+    Returns:
+        Timings by tool and phase, and the file they were saved to if TODOS_PROFILE_DIR is set
+    """
+    if stop:
+        profiler.stop()
+    directory = os.environ.get("TODOS_PROFILE_DIR")
+    saved = profiler.dump(directory) if directory and profiler.started else None
+    if wants_json(response_format):
+        summary = profiler.summary()
+        if summary is None:
+            return error_response(True, "not_started", "Profiling has not been started")
+        return json_response({**summary, "saved_to": saved})
+    report = profiler.report()
+    if saved:
+        report += f"\nSaved to {saved}\n"
+    return report
+
+# Registered only when TODOS_PROFILING is set
+PROFILING_TOOLS = [start_profiling, get_profile]
+
+TOOLS = [
+    create_todo,
+    list_todos,
+    search_todos,
+    get_todo,
+    update_todo,
+    complete_todo,
+    uncomplete_todo,
+    delete_todo,
+    clear_completed_todos,
+    get_todo_stats,
+    list_due,
+    next_due,
+    complete_todo_by_number,
+    create_todos,
+    update_todos,
+    complete_todos,
+    delete_todos,
+]
+
+def setup(mcp: FastMCP, todos_file: str, hints: bool = True):
+    """Open the todo store and register all todo tools on an MCP server
+
+    Args:
+        mcp: The server to register the tools on
+        todos_file: Path of the default tenant's todos file; other tenants get shards next to it (see tenants.tenant_path)
+        hints: Whether list_todos repeats IDs as completion hints
+    """
+    global registry, completion_hints
+    registry = StoreRegistry(todos_file, int(os.environ.get("TODOS_MAX_OPEN_STORES", 64)))
+    # Flush queued writes on shutdown
+    atexit.register(registry.close)
+    completion_hints = hints
+    for tool in TOOLS:
+        mcp.add_tool(offloaded(tool))
+    if os.environ.get("TODOS_PROFILING", "").lower() in ("1", "true", "yes"):
+        for tool in PROFILING_TOOLS:
+            mcp.add_tool(offloaded(tool))